@@ -1,102 +1,188 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import data_manager as dm
+import ingest
+import perf
+import sheets_client
+import pricing
+import schema
+from pricing import safe_float
+from search_engine import SearchEngine, MultiEngine
+from quote_pdf import PDFCache, create_pdf, quote_hash, export_zip
 from io import BytesIO
-import hashlib
 import json
+import os
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import date
-from fpdf import FPDF
 import time
+import threading
 
 st.set_page_config(page_title="Product Check App", layout="wide")
 
-# --- HELPERS ---
-def safe_float(val):
-    try:
-        clean = str(val).replace('$', '').replace(',', '').strip()
-        if not clean or clean.lower() in ['none', 'nan']: return 0.0
-        return float(clean)
-    except: return 0.0
-
-def sanitize_text(text):
-    if not isinstance(text, str): return str(text)
-    text = text.replace('\u2013', '-').replace('\u2019', "'")
-    return text.encode('latin-1', 'replace').decode('latin-1')
-
-def normalize_items(items):
-    clean = []
-    if not isinstance(items, list): return []
-    for item in items:
-        n = item.copy()
-        n['qty'] = safe_float(n.get('qty', 1))
-        n['price'] = safe_float(n.get('price', 0))
-        n['discount_val'] = safe_float(n.get('discount_val', 0))
-        if 'discount_type' not in n: n['discount_type'] = '%'
-        if 'desc' not in n: n['desc'] = ""
-        if 'name' not in n: n['name'] = "Item"
-        
-        g = n['qty'] * n['price']
-        d = g * (n['discount_val']/100) if n['discount_type'] == '%' else n['discount_val']
-        n['total'] = g - d
-        clean.append(n)
-    return clean
-
 # --- SEARCH LOGIC ---
+BLANK = schema.BLANK
+
+def _text(s):
+    """s.fillna('').astype(str), converting each category of a categorical once rather than every row."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        cats = np.append(s.cat.categories.astype(str).to_numpy(dtype=object), '')
+        return pd.Series(cats[s.cat.codes.to_numpy()], index=s.index, dtype=str)  # code -1 (NaN) -> ''
+    return s.fillna('').astype(str)
+
+def roles_for(df, category):
+    """Column roles of one category, from the schemas the catalog was loaded with."""
+    return (df.attrs.get('schemas') or {}).get(category) or schema.infer(list(df.columns))
+
+def schema_groups(df):
+    """(row mask, roles) per distinct column layout, so categories sharing one are handled together."""
+    schemas = df.attrs.get('schemas')
+    if not schemas or 'category' not in df.columns: return [(slice(None), schema.infer(list(df.columns)))]
+    groups = schema.groups(schemas)
+    if len(groups) == 1: return [(slice(None), groups[0][0])]
+    return [(df['category'].isin(cats), roles) for roles, cats in groups]
+
+@perf.timed()
 def generate_search_labels(df):
-    if df.empty: return df, None
-    def col_ok(d, c): return not d[c].astype(str).str.strip().eq('').all()
-    valid_cols = [c for c in df.columns if col_ok(df, c)]
-    if not valid_cols: return df, None
-    name_col = valid_cols[0]
-    for c in valid_cols:
-        if 'product' in c.lower() or 'model' in c.lower(): name_col = c; break
-    forbidden = ['price', 'cost', 'date', 'category', 'srp', 'msrp', 'margin']
-    def mk_lbl(row):
-        m = str(row[name_col]) if pd.notnull(row[name_col]) else ""
-        if m.lower() in ['nan','', 'none']: return None
-        parts = [m.strip()]
-        for c in valid_cols:
-            if c != name_col and not any(k in c.lower() for k in forbidden):
-                v = str(row[c]).strip()
-                if v and v.lower() not in ['nan', 'none', '']: parts.append(v)
-        return " | ".join(filter(None, parts))
-    df['Search_Label'] = df.apply(mk_lbl, axis=1)
-    return df, name_col
-
-def extract_product_data(label, df_with_labels, name_col):
-    if not label or df_with_labels.empty: return None
-    match = df_with_labels[df_with_labels['Search_Label'] == label]
-    if match.empty: return None
-    row = match.iloc[0]
-    p_name = str(row[name_col])
-    p_price = 0.0
-    p_cols = [c for c in df_with_labels.columns if any(x in c.lower() for x in ['price', 'msrp', 'srp', 'cost'])]
-    for pc in p_cols:
-        val = safe_float(row[pc])
-        if val > 0: p_price = val; break
-    p_desc = ""
-    d_cols = [c for c in df_with_labels.columns if any(x in c.lower() for x in ['long description', 'description', 'specs', 'detail'])]
-    for dc in d_cols:
-        val = str(row[dc])
-        if val and val.lower() not in ['nan', 'none', '']: p_desc = val; break
-    if not p_desc:
-        parts = []
-        forbidden = ['price', 'cost', 'date', 'category', 'srp', 'msrp', 'margin', 'search_label']
-        for c in df_with_labels.columns:
-            if c == name_col or any(k in c.lower() for k in forbidden): continue
-            v = str(row[c]).strip()
-            if v and v.lower() not in ['nan', 'none', '']: parts.append(f"{c}: {v}")
-        p_desc = " | ".join(parts)
-    return {"name": p_name, "desc": p_desc, "price": p_price}
+    """Adds Search_Label: each row's name column, then its category's label columns where filled."""
+    if df.empty: return df
+    out = pd.Series(None, index=df.index, dtype=object)
+    for m, roles in schema_groups(df):
+        name = roles['name']
+        if name not in df.columns: continue
+        raw = _text(df.loc[m, name])
+        lbl = raw.str.strip()
+        for c in roles['label']:
+            if c not in df.columns: continue
+            v = _text(df.loc[m, c]).str.strip()
+            lbl = lbl.mask(~v.str.lower().isin(BLANK), (lbl + " | " + v).where(lbl.ne(''), v))
+        out.loc[lbl.index] = lbl.where(~raw.str.lower().isin(BLANK), None)
+    df['Search_Label'] = out
+    return df
+
+@perf.timed()
+def build_product_lookup(df_lbl):
+    """{category: {Search_Label: autofill record of its first row in that category}}."""
+    if 'Search_Label' not in df_lbl.columns: return {}
+    by = ['category', 'Search_Label'] if 'category' in df_lbl.columns else 'Search_Label'
+    df = df_lbl[df_lbl['Search_Label'].notna()].drop_duplicates(by)
+    out = {}
+    for m, roles in schema_groups(df):
+        name = roles['name']
+        sub = df.loc[m]
+        if sub.empty or name not in sub.columns: continue
+        price = pd.Series(0.0, index=sub.index)
+        for pc in [c for c in roles['price'] if c in sub.columns]:
+            v = sub[pc].fillna(0.0) if pd.api.types.is_float_dtype(sub[pc]) else pricing.to_number(sub[pc])
+            price = price.mask(price.le(0) & v.gt(0), v)
+        desc = pd.Series('', index=sub.index)
+        for dc in [c for c in roles['desc'] if c in sub.columns]:
+            v = _text(sub[dc])
+            desc = desc.mask(desc.eq('') & ~v.str.lower().isin(BLANK), v)
+        # No description column filled in: fall back to "col: value | ..." over the label columns
+        fb = pd.Series('', index=sub.index)
+        for c in [c for c in roles['label'] if c in sub.columns]:
+            v = _text(sub[c]).str.strip()
+            part = f"{c}: " + v
+            fb = fb.mask(~v.str.lower().isin(BLANK), (fb + " | " + part).where(fb.ne(''), part))
+        desc = desc.where(desc.ne(''), fb)
+        cats = sub['category'].tolist() if 'category' in sub.columns else [None] * len(sub)
+        for c, l, n, d, p in zip(cats, sub['Search_Label'].tolist(), _text(sub[name]).tolist(), desc.tolist(), price.tolist()):
+            out.setdefault(c, {})[l] = {"name": n, "desc": d, "price": p}
+    return out
+
+@perf.timed()
+def build_label_parts(frames):
+    """Label index parts for {category: frame}. Labels and lookups come from one
+    pass over all the frames' rows; each category then gets its own engine."""
+    df = pd.concat(frames)  # (category, row) index
+    df.attrs['schemas'] = {c: r for f in frames.values() for c, r in f.attrs.get('schemas', {}).items()}
+    labels = generate_search_labels(df)['Search_Label']
+    lookups = build_product_lookup(df)
+    parts = {}
+    for c, f in frames.items():
+        lookup = lookups.get(c, {})
+        opts = sorted(lookup)  # the lookup's own key strings, not a second copy of every label
+        parts[c] = {"category": c, "df": f, "labels": labels.xs(c), "roles": roles_for(f, c), "lookup": lookup,
+                    "engine": SearchEngine(opts, [lookup[o]['name'] for o in opts])}
+    return parts
+
+@st.cache_resource
+def _label_parts():
+    """{category: (frame version, part)} plus the last combined index, shared by all sessions."""
+    return {"parts": {}, "combined": (None, None), "lock": threading.Lock()}
+
+def _combine(parts):
+    lookup = {}
+    for p in reversed(parts): lookup.update(p['lookup'])  # a label in several categories keeps the first
+    return {"parts": parts, "options": sorted(lookup), "lookup": lookup,
+            "engine": MultiEngine([p['engine'] for p in parts])}
+
+@perf.timed()
+def get_label_index():
+    """Sorted options, label lookup and search engine over every category.
+
+    Built from per-category parts, so an upload to one category rebuilds only
+    its part. Shared by every rerun and session, so callers must treat it as
+    read-only.
+    """
+    cats = dm.get_categories()
+    reg = _label_parts()
+    with reg['lock']:
+        parts = reg['parts']  # empty categories hold (version, None)
+        for c in [c for c in parts if c not in cats]: del parts[c]
+        todo = [c for c in cats if c not in parts or parts[c][0] != dm.category_version(c)]
+        stale = {}
+        for c, df in (dm.category_frames(todo) if todo else {}).items():
+            v = dm.catalog_version(df)
+            if c in parts and parts[c][0] == v: continue
+            if df.empty: parts[c] = (v, None)
+            else: stale[c] = df
+        if stale:
+            for c, p in build_label_parts(stale).items(): parts[c] = (dm.catalog_version(stale[c]), p)
+        key = tuple((c, parts[c][0]) for c in cats if c in parts and parts[c][1] is not None)
+        if reg['combined'][0] != key: reg['combined'] = (key, _combine([parts[c][1] for c, _ in key]))
+        return reg['combined'][1]
+
+def label_rows(idx, label):
+    """[(rows, roles)] carrying label, per category that has it."""
+    return [(p['df'][p['labels'] == label], p['roles']) for p in idx['parts'] if label in p['lookup']]
+
+def fmt_price(v):
+    """Catalog prices are parsed floats (NaN = blank); unparsed columns stay text."""
+    if isinstance(v, float): return "" if v != v else f"${v:,.2f}"
+    return f"{v}"
+
+def price_config(df, roles):
+    return {c: st.column_config.NumberColumn(c, format="$%.2f") for c in roles['price']
+            if c in df.columns and pd.api.types.is_float_dtype(df[c])}
+
+def extract_product_data(label, idx):
+    rec = idx['lookup'].get(label) if label else None
+    return dict(rec) if rec else None
+
+SEARCH_K = 25
+
+def search_box(index, label, key, **kw):
+    """Query box + top-k ranked results, so only a page of labels reaches the browser.
+    index() returns the label index and is only called once there is a query; the
+    hits are kept in session_state[key + "_hits"] for other widgets to offer."""
+    q = st.text_input(label, key=f"{key}_q", placeholder="Model, name or spec")
+    hits = index()['engine'].search(q, SEARCH_K) if q else []
+    st.session_state[f"{key}_hits"] = hits
+    return st.selectbox(f"{label} results", hits, index=None, key=key, label_visibility="collapsed",
+                        placeholder=f"{len(hits)} matches" if q else "Type to search", **kw)
 
 # --- CALLBACKS ---
 def on_search_change():
     lbl = st.session_state.get("q_search_product")
     if lbl:
         try:
-            df = dm.get_all_products_df()
-            df_lbl, name_col = generate_search_labels(df)
-            data = extract_product_data(lbl, df_lbl, name_col)
+            idx = get_label_index()
+            data = extract_product_data(lbl, idx)
             if data:
                 st.session_state['input_name'] = data['name']
                 st.session_state['input_desc'] = data['desc']
@@ -128,8 +214,7 @@ def save_quote_cb():
     items = st.session_state.get('quote_items', [])
     if not items: st.toast("No items!", icon="⚠️"); return
     
-    items = normalize_items(items)
-    total = sum(i['total'] for i in items) * 1.10
+    items, totals = pricing.price_items(items)
     
     seller_data = {
         "name": st.session_state.get("s_name", ""),
@@ -141,170 +226,126 @@ def save_quote_cb():
         "client_name": st.session_state.get("q_client_input"),
         "client_email": st.session_state.get("q_email_input"),
         "client_phone": st.session_state.get("q_phone_input"),
-        "total_amount": total,
+        "total_amount": totals['total'],
         "expiration_date": str(st.session_state.get("q_expire_input")),
         "seller_info": seller_data,
         "items": items
     }
-    dm.save_quote(payload, st.session_state['user'])
+    editing = st.session_state.get('editing_quote')
+    if editing:
+        saved = dm.update_quote(editing, payload, st.session_state['user'])
+        if not saved: st.toast(f"{editing} no longer exists", icon="⚠️"); return
+        if saved != editing: st.toast(f"{editing} is shared by several quotes; saved as {saved}", icon="ℹ️")
+    else: dm.save_quote(payload, st.session_state['user'])
     st.session_state['quote_items'] = []
     st.session_state['input_name'] = ""
+    st.session_state['editing_quote'] = None
     st.toast("Quote Saved!", icon="✅")
 
-# --- PDF (COMBINED BOX LAYOUT) ---
-class QuotePDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 20); self.cell(80, 10, 'MSI', 0, 0, 'L') 
-        self.set_font('Arial', 'B', 16); self.cell(110, 10, 'Quote', 0, 1, 'R'); self.ln(5)
-    def footer(self):
-        self.set_y(-15); self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, 'Generated by Product Check App - MSI Confidential', 0, 0, 'C')
-
-def create_pdf(quote_row):
-    pdf = QuotePDF(); pdf.add_page(); pdf.set_auto_page_break(True, 15)
-    
-    raw_items = quote_row.get('items_json', '[]')
-    try: items = normalize_items(json.loads(raw_items))
-    except: items = []
-    
-    try: seller_info = json.loads(quote_row.get('seller_info', '{}'))
-    except: seller_info = {}
-    
-    s_name = sanitize_text(seller_info.get("name", "MSI Australia"))
-    s_email = sanitize_text(seller_info.get("email", "vincentxu@msi.com"))
-    s_phone = sanitize_text(seller_info.get("phone", ""))
-    
-    c_name = sanitize_text(quote_row.get('client_name', ''))
-    c_email = sanitize_text(quote_row.get('client_email', ''))
-    c_phone = sanitize_text(str(quote_row.get('client_phone', '')))
-    qid = sanitize_text(str(quote_row.get('quote_id', '')))
-    dt = str(quote_row.get('created_at', ''))[:10]
-    exp = str(quote_row.get('expiration_date', ''))
-    if not exp or exp == 'nan': exp = "N/A"
-    
-    sub = sum(i['total'] for i in items)
-    gst = sub * 0.10; grand = sub + gst
-    
-    pdf.set_font('Arial', '', 10); rx = 130
-    pdf.set_xy(rx, 20); pdf.cell(30, 6, "Quote ref:", 0, 0); pdf.cell(30, 6, qid, 0, 1)
-    pdf.set_x(rx); pdf.cell(30, 6, "Issue date:", 0, 0); pdf.cell(30, 6, dt, 0, 1)
-    pdf.set_x(rx); pdf.cell(30, 6, "Expires:", 0, 0); pdf.cell(30, 6, exp, 0, 1)
-    pdf.set_x(rx); pdf.cell(30, 6, "Currency:", 0, 0); pdf.cell(30, 6, "AUD", 0, 1)
-    pdf.ln(10)
-    
-    ys = pdf.get_y()
-    pdf.set_font('Arial', 'B', 11); pdf.cell(90, 6, "Seller", 0, 1)
-    pdf.set_font('Arial', '', 10)
-    if s_name: pdf.cell(90, 5, s_name, 0, 1)
-    else: pdf.cell(90, 5, "MSI Australia", 0, 1)
-    pdf.cell(90, 5, "Suite 304, Level 3, 63-79 Parramatta Rd", 0, 1)
-    pdf.cell(90, 5, "Silverwater, NSW 2128, Australia", 0, 1)
-    contact_str = f"Email: {s_email}"
-    if s_phone: contact_str += f" | Phone: {s_phone}"
-    pdf.cell(90, 5, contact_str, 0, 1)
-    
-    pdf.set_xy(110, ys)
-    pdf.set_font('Arial', 'B', 11); pdf.cell(80, 6, "Buyer", 0, 1)
-    pdf.set_x(110); pdf.set_font('Arial', '', 10)
-    pdf.cell(80, 5, c_name, 0, 1)
-    if c_email: pdf.set_x(110); pdf.cell(80, 5, f"Email: {c_email}", 0, 1)
-    if c_phone and c_phone != 'nan': pdf.set_x(110); pdf.cell(80, 5, f"Phone: {c_phone}", 0, 1)
-    pdf.ln(15)
-    
-    # Table
-    pdf.set_font('Arial', 'B', 10); pdf.set_fill_color(240, 240, 240)
-    pdf.cell(90, 8, "Item Description", 1, 0, 'L', True) # Merged Header
-    pdf.cell(15, 8, "Qty", 1, 0, 'C', True)
-    pdf.cell(25, 8, "Price", 1, 0, 'R', True)
-    pdf.cell(30, 8, "Disc", 1, 0, 'R', True)
-    pdf.cell(30, 8, "Total", 1, 1, 'R', True)
-    
-    pdf.set_font('Arial', '', 9)
-    if not items:
-        pdf.cell(190, 10, "No items found", 1, 1, 'C')
-    else:
-        for i in items:
-            nm = sanitize_text(i['name'])
-            desc = sanitize_text(i['desc'])
-            
-            # MERGED CELL CONTENT
-            text_content = nm
-            if desc: text_content += f"\n{desc}"
-            
-            # Save Start
-            x_start = pdf.get_x()
-            y_start = pdf.get_y()
-            
-            # 1. Draw MultiCell for Name+Desc
-            pdf.multi_cell(90, 5, text_content, border=1, align='L')
-            
-            # 2. Get Height
-            y_end = pdf.get_y()
-            row_height = y_end - y_start
-            
-            # 3. Draw others to match height
-            pdf.set_xy(x_start + 90, y_start)
-            
-            ds = f"{i['discount_val']}%" if i['discount_type']=='%' else f"${i['discount_val']}"
-            
-            pdf.cell(15, row_height, str(int(i['qty'])), 1, 0, 'C')
-            pdf.cell(25, row_height, f"${i['price']:,.2f}", 1, 0, 'R')
-            pdf.cell(30, row_height, ds, 1, 0, 'R')
-            pdf.cell(30, row_height, f"${i['total']:,.2f}", 1, 1, 'R')
-            
-            # Move cursor to end of this row
-            pdf.set_xy(x_start, y_end)
+# --- PDF ---
+PDF_WORKERS = os.cpu_count() or 2
+MAX_EXPORT = 2000
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "pc-exports")
+EXPORT_TTL = 3600  # seconds a ZIP nobody downloaded is kept
+
+@st.cache_resource
+def get_pdf_cache():
+    return PDFCache()
 
-    pdf.ln(5)
-    pdf.set_x(130); pdf.cell(30, 6, "Subtotal:", 0, 0, 'R'); pdf.cell(30, 6, f"${sub:,.2f}", 0, 1, 'R')
-    pdf.set_x(130); pdf.cell(30, 6, "GST (10%):", 0, 0, 'R'); pdf.cell(30, 6, f"${gst:,.2f}", 0, 1, 'R')
-    pdf.set_font('Arial', 'B', 10)
-    pdf.set_x(130); pdf.cell(30, 8, "Total:", 0, 0, 'R'); pdf.cell(30, 8, f"${grand:,.2f}", 0, 1, 'R')
-    return pdf.output(dest='S').encode('latin-1')
+@st.cache_resource
+def get_pdf_pool():
+    # spawn, not fork: forking the threaded server process can deadlock the child
+    return ProcessPoolExecutor(PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+@perf.timed()
+def get_pdf(quote_row, summary=None):
+    """create_pdf behind the shared cache, so an unchanged quote is never rendered twice."""
+    key, cache = quote_hash(quote_row), get_pdf_cache()
+    data = cache.get(key)
+    if data is None:
+        data = create_pdf(quote_row, summary); cache.put(key, data)
+    return data
+
+@perf.timed()
+def build_zip(rows, progress=None):
+    """Renders quote rows into a temporary ZIP on disk; returns its path.
+    Workers price each quote from its items_json, so no summary work runs here.
+    A pool left broken by a dead worker is replaced and the export retried once;
+    PDFs finished before the crash come back from the cache."""
+    jobs = [(r, None) for r in rows]
+    sweep_exports()
+    fd, path = tempfile.mkstemp(suffix=".zip", dir=EXPORT_DIR); os.close(fd)
+    try:
+        try: export_zip(jobs, path, get_pdf_pool(), PDF_WORKERS, get_pdf_cache(), progress)
+        except BrokenProcessPool:
+            get_pdf_pool().shutdown(wait=False); get_pdf_pool.clear()
+            export_zip(jobs, path, get_pdf_pool(), PDF_WORKERS, get_pdf_cache(), progress)
+    except:
+        os.remove(path); raise
+    return path
+
+def sweep_exports():
+    """Deletes ZIPs left behind by sessions that ended without downloading them."""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    cutoff = time.time() - EXPORT_TTL
+    for n in os.listdir(EXPORT_DIR):
+        p = os.path.join(EXPORT_DIR, n)
+        try:
+            if os.path.getmtime(p) < cutoff: os.remove(p)
+        except: pass
+
+def take_zip(path):
+    """The ZIP's bytes, removing the file: an export is downloaded once."""
+    try:
+        with open(path, 'rb') as f: return f.read()
+    finally:
+        try: os.remove(path)
+        except: pass
+
+HISTORY_PAGE = 20
+QUOTE_STATUSES = ["Draft", "Sent", "Accepted", "Declined"]
 
 # --- MAIN ---
 def main_app():
     st.sidebar.title(f"User: {st.session_state['user']}")
-    if st.sidebar.button("Logout"): st.session_state['logged_in'] = False; st.rerun()
-    menu = st.sidebar.radio("Navigate", ["Product Search & Browse", "Quote Generator", "Data Admin"])
+    if st.sidebar.button("Logout"):
+        dm.logout(st.session_state.get('token')); st.session_state['logged_in'] = False; st.rerun()
+    pages = ["Product Search & Browse", "Quote Generator", "Data Admin"]
+    if st.session_state.get('role') == 'admin': pages.append("Performance")
+    menu = st.sidebar.radio("Navigate", pages, key="nav")
     
     if menu == "Product Search & Browse":
         st.header("🔎 Search")
-        if st.button("Refresh DB"): dm.get_all_products_df.clear(); st.rerun()
-        try: df = dm.get_all_products_df()
-        except: df = pd.DataFrame()
+        if st.button("Refresh DB"): dm.refresh_catalog(); st.rerun()
         
         t1, t2 = st.tabs(["Search", "Browse"])
         with t1:
-            if not df.empty:
-                df_lbl, name_col = generate_search_labels(df)
-                if df_lbl.empty: st.warning("No data")
-                else:
-                    opts = sorted(df_lbl['Search_Label'].dropna().unique().tolist())
-                    sel = st.selectbox("Search", opts, index=None, key="s_main")
-                    if sel:
-                        st.divider()
-                        res = df_lbl[df_lbl['Search_Label'] == sel]
+            if not dm.get_categories(): st.warning("No data")
+            else:
+                sel = search_box(get_label_index, "Search", "s_main")
+                if sel:
+                    st.divider()
+                    for res, roles in label_rows(get_label_index(), sel):
                         for i, r in res.iterrows():
-                            with st.expander(f"📦 {r[name_col]}", expanded=True):
-                                price_cols = [c for c in res.columns if any(x in c.lower() for x in ['price', 'cost', 'srp', 'msrp'])]
+                            with st.expander(f"📦 {r.get(roles['name'], sel)}", expanded=True):
+                                price_cols = [c for c in roles['hidden'] if c in res.columns]
                                 pub_cols = [c for c in res.columns if c not in price_cols and c != 'Search_Label']
                                 for c in pub_cols: st.write(f"**{c}:** {r[c]}")
                                 if price_cols:
                                     st.markdown("---")
-                                    if st.toggle("Show Prices", key=f"t_{i}"):
-                                        for pc in price_cols: st.metric(pc, f"{r[pc]}")
+                                    if st.toggle("Show Prices", key=f"t_{r['category']}_{i}"):
+                                        for pc in price_cols: st.metric(pc, fmt_price(r[pc]))
         with t2:
             cats = dm.get_categories()
             if cats:
                 cs = st.selectbox("Category", cats)
-                if not df.empty and 'category' in df.columns:
-                    cd = df[df['category'] == cs]
+                cd = dm.get_category_df(cs)  # only the selected category is loaded
+                if not cd.empty:
+                    roles = roles_for(cd, cs)
                     if st.toggle("Show Prices in Table", key="t_browse"):
-                        st.dataframe(cd, use_container_width=True)
+                        st.dataframe(cd, use_container_width=True, column_config=price_config(cd, roles))
                     else:
-                        bad = ['price', 'cost', 'srp', 'msrp']
-                        cols = [c for c in cd.columns if not any(x in c.lower() for x in bad)]
+                        cols = [c for c in cd.columns if c not in roles['hidden']]
                         st.dataframe(cd[cols], use_container_width=True)
 
     elif menu == "Quote Generator":
@@ -312,14 +353,7 @@ def main_app():
         t1, t2 = st.tabs(["Create", "History"])
         
         with t1:
-            try: df = dm.get_all_products_df()
-            except: df = pd.DataFrame()
-            search_opts = []
-            df_lbl = pd.DataFrame()
-            name_col = None
-            if not df.empty:
-                df_lbl, name_col = generate_search_labels(df)
-                if not df_lbl.empty: search_opts = sorted(df_lbl['Search_Label'].dropna().unique().tolist())
+            idx = get_label_index()
 
             st.subheader("1. Client")
             c1, c2, c3 = st.columns(3)
@@ -337,7 +371,7 @@ def main_app():
 
             st.divider()
             st.subheader("2. Add Item")
-            st.selectbox("Search (Auto-fill)", search_opts, index=None, key="q_search_product", on_change=on_search_change)
+            search_box(lambda: idx, "Search (Auto-fill)", "q_search_product", on_change=on_search_change)
             c1, c2 = st.columns([1, 2])
             c1.text_input("Product", key="input_name")
             c2.text_input("Desc", key="input_desc")
@@ -350,12 +384,13 @@ def main_app():
             st.divider()
 
             st.subheader("3. Review")
+            if st.session_state.get('editing_quote'): st.caption(f"Editing {st.session_state['editing_quote']}")
             if st.session_state['quote_items']:
-                st.session_state['quote_items'] = normalize_items(st.session_state['quote_items'])
-                q_df = pd.DataFrame(st.session_state['quote_items'])
+                q_df = pricing.price_frame(pd.DataFrame(st.session_state['quote_items']))
                 if 'table_key' not in st.session_state: st.session_state['table_key'] = 0
+                # Current items plus the latest search hits; new products are found with the search box
                 curr_names = q_df['name'].unique().tolist()
-                comb_opts = sorted(list(set(search_opts + curr_names))) if search_opts else curr_names
+                comb_opts = list(dict.fromkeys(curr_names + st.session_state.get("q_search_product_hits", [])))
                 
                 edited = st.data_editor(
                     q_df, num_rows="dynamic", use_container_width=True, key=f"tbl_{st.session_state['table_key']}",
@@ -365,59 +400,104 @@ def main_app():
                     }
                 )
                 
-                new_items = []; trigger = False
-                for idx, row in edited.iterrows():
-                    nm = str(row['name'])
-                    if "|" in nm and nm in search_opts:
-                        d = extract_product_data(nm, df_lbl, name_col)
-                        if d:
-                            row['name'] = d['name']; row['desc'] = d['desc']
-                            row['price'] = d['price']; row['qty'] = 1.0
-                            trigger = True
-                    q = safe_float(row.get('qty', 1)); p = safe_float(row.get('price', 0))
-                    d = safe_float(row.get('discount_val', 0)); t = row.get('discount_type', '%')
-                    g = q*p; di = g*(d/100) if t=='%' else d
-                    row['total'] = g - di
-                    new_items.append(row.to_dict())
+                # A search label picked in the Item column autofills that row; labels that are
+                # already the product name (no label columns) would refill forever, so skip them
+                lookup = idx['lookup']
+                picked = edited['name'].map(lambda n: n in lookup and lookup[n]['name'] != n).astype(bool)
+                trigger = bool(picked.any())
+                if trigger:
+                    edited = edited.copy()
+                    for i in edited.index[picked]:
+                        d = extract_product_data(edited.at[i, 'name'], idx)
+                        edited.loc[i, ['name', 'desc', 'price', 'qty']] = [d['name'], d['desc'], d['price'], 1.0]
+                priced = pricing.price_frame(edited)
                 
-                st.session_state['quote_items'] = new_items
+                st.session_state['quote_items'] = priced.to_dict('records')
                 if trigger: 
                     st.session_state['table_key'] += 1
                     st.rerun()
 
-                sub = sum(i['total'] for i in new_items); gst = sub*0.1; grand = sub+gst
+                t = pricing.totals(pricing.to_cents(priced['total']))
+                sub, gst, grand = t['subtotal'], t['gst'], t['total']
                 c1, c2, c3 = st.columns(3)
                 c1.metric("Subtotal", f"${sub:,.2f}")
                 c2.metric("GST", f"${gst:,.2f}")
                 c3.metric("Grand Total", f"${grand:,.2f}")
                 c_a1, c_a2 = st.columns([1, 4])
                 c_a1.button("💾 Save Quote", type="primary", on_click=save_quote_cb)
-                if c_a2.button("Clear"): st.session_state['quote_items'] = []; st.rerun()
+                if c_a2.button("Clear"):
+                    st.session_state['quote_items'] = []; st.session_state['editing_quote'] = None; st.rerun()
             else: st.info("Empty")
 
         with t2:
             st.subheader("📜 History")
-            if st.button("Refresh List"): dm.get_quotes.clear(); st.rerun()
-            hist = dm.get_quotes()
+            if st.button("Refresh List"): dm.refresh_quotes(); st.rerun()
+            opts = dm.quote_filter_options()
+            f1, f2, f3, f4 = st.columns(4)
+            f_client = f1.text_input("Client", key="h_client")
+            f_creator = f2.selectbox("Created by", ["All"] + opts['creators'], key="h_creator")
+            f_status = f3.selectbox("Status", ["All"] + opts['statuses'], key="h_status")
+            f_dates = f4.date_input("Date range", value=(), key="h_dates")
+            if 'h_page' not in st.session_state: st.session_state['h_page'] = 1
+            filters = dict(client=f_client, creator=None if f_creator == "All" else f_creator,
+                           status=None if f_status == "All" else f_status,
+                           date_from=f_dates[0] if len(f_dates) > 0 else None,
+                           date_to=f_dates[1] if len(f_dates) > 1 else None)
+            hist, n_hits = dm.query_quotes(page=st.session_state['h_page'] - 1, page_size=HISTORY_PAGE, **filters)
+            if n_hits and hist.empty:
+                # Filters narrowed the result below the current page
+                st.session_state['h_page'] = 1
+                hist, n_hits = dm.query_quotes(page=0, page_size=HISTORY_PAGE, **filters)
             if not hist.empty:
-                hist.columns = [c.strip() for c in hist.columns]
-                if 'created_at' in hist.columns: hist = hist.sort_values('created_at', ascending=False)
+                n_pages = -(-n_hits // HISTORY_PAGE)
+                p1, p2 = st.columns([1, 4])
+                p1.number_input("Page", 1, n_pages, key="h_page")
+                p2.caption(f"{n_hits} quotes · page {st.session_state['h_page']} of {n_pages}")
+                b1, b2, b3, b4 = st.columns([3, 1, 1, 1])
+                sel = b1.multiselect("Selected", hist['quote_id'].tolist(), key=f"h_sel_{st.session_state['h_page']}")
+                new_status = b2.selectbox("Status", QUOTE_STATUSES, key="h_new_status")
+                if b3.button("Apply status", disabled=not sel):
+                    n = dm.set_quote_status(sel, new_status, st.session_state['user'])
+                    st.toast(f"{n} updated"); st.rerun()
+                if b4.button("Delete selected", disabled=not sel):
+                    n = dm.delete_quotes(sel, st.session_state['user'])
+                    st.toast(f"{n} deleted"); st.rerun()
+                with st.expander("📦 Export PDFs"):
+                    scope = st.radio("Quotes", ["Selected", "All matching"], horizontal=True, key="h_zip_scope")
+                    st.caption(f"{len(sel)} selected · {n_hits} matching (max {MAX_EXPORT})")
+                    if st.button("Build ZIP", key="h_zip_go"):
+                        if scope == "Selected": rows = hist[hist['quote_id'].isin(sel)]
+                        else: rows, _ = dm.query_quotes(page=0, page_size=MAX_EXPORT, **filters)
+                        if rows.empty: st.warning("Nothing to export.")
+                        else:
+                            bar = st.progress(0.0)
+                            try:
+                                path = build_zip(rows.to_dict('records'), lambda d, t: bar.progress(d / t, f"{d}/{t} PDFs"))
+                                old = st.session_state.get('h_zip')
+                                if old and os.path.exists(old): os.remove(old)
+                                st.session_state['h_zip'] = path
+                            except Exception as e: st.error(f"Export Error: {e}")
+                    zp = st.session_state.get('h_zip')
+                    if zp and os.path.exists(zp):
+                        # Read only when clicked, then dropped, so reruns don't reload the archive
+                        st.download_button("📩 Download ZIP", lambda: take_zip(zp), "quotes.zip", "application/zip",
+                                           key="h_zip_dl", on_click=lambda: st.session_state.pop('h_zip', None))
                 for i, r in hist.iterrows():
-                    try:
-                        amt = safe_float(r.get('total_amount', 0))
-                        if amt == 0 and 'items_json' in r:
-                            its = normalize_items(json.loads(r['items_json']))
-                            amt = sum(x['total'] for x in its) * 1.10
-                    except: amt = 0.0
+                    amt = safe_float(r.get('total_amount', 0)) or r.get('grand_total', 0.0)
                     with st.expander(f"{r.get('created_at','?')} | {r.get('client_name','?')} | ${amt:,.2f}"):
-                        try:
-                            pdf_data = create_pdf(r)
+                        # Render on demand only; already-rendered quotes come straight from the cache
+                        pdf_data = get_pdf_cache().get(quote_hash(r))
+                        if pdf_data is None and st.button("📄 Prepare PDF", key=f"p_{i}"):
+                            # Priced from this row, not by quote_id, which legacy quotes may share
+                            try: pdf_data = get_pdf(r, pricing.quote_summary(r.get('items_json', '')))
+                            except Exception as e: st.error(f"PDF Error: {e}")
+                        if pdf_data:
                             # UNIQUE KEY ADDED HERE
                             st.download_button("📩 PDF", pdf_data, f"Quote.pdf", "application/pdf", key=f"dl_{i}")
-                        except Exception as e: st.error(f"PDF Error: {e}")
                         if st.button("✏️ Edit", key=f"e_{i}"):
                             try:
-                                st.session_state['quote_items'] = normalize_items(json.loads(r['items_json']))
+                                st.session_state['quote_items'] = pricing.quote_summary(r.get('items_json', ''))['items']
+                                st.session_state['editing_quote'] = r.get('quote_id')
                                 st.session_state['q_client_input'] = r.get('client_name', '')
                                 st.session_state['q_email_input'] = r.get('client_email', '')
                                 st.session_state['q_phone_input'] = r.get('client_phone', '')
@@ -437,12 +517,63 @@ def main_app():
         up = st.file_uploader("Upload", accept_multiple_files=False)
         cats = dm.get_categories()
         c_sel = st.selectbox("Category", cats if cats else ["Default"])
+        key_col = st.text_input("Key column (blank = replace whole category)", placeholder="e.g. Model")
         if up and st.button("Process"):
             try:
-                df = pd.read_csv(up) if up.name.endswith('csv') else pd.read_excel(up)
-                dm.save_products_dynamic(df.dropna(how='all'), c_sel, st.session_state['user'])
-                st.success("Done!")
-            except Exception as e: st.error(str(e))
+                if key_col:
+                    vals = ingest.load_values(up.name, up.getvalue())
+                    df = pd.DataFrame(vals[1:], columns=vals[0])
+                    r = dm.update_products_dynamic(df, c_sel, st.session_state['user'], key_col)
+                    st.success(f"Done! {r['new']} new, {r['updated']} changed, {r['eol']} EOL")
+                else:
+                    bar = st.progress(0.0, text="Uploading...")
+                    def prog(done, total):
+                        bar.progress(min(done / total, 1.0) if total else 0.0, text=f"Uploaded {done:,} rows")
+                    n = dm.ingest_products(up.name, up.getvalue(), c_sel, st.session_state['user'], prog)
+                    bar.progress(1.0, text=f"Uploaded {n:,} rows")
+                    st.success("Done!")
+            except Exception as e: st.error(f"{e} (re-run the same file to resume)" if not key_col else str(e))
+        if st.session_state.get('role') == 'admin' and cats: schema_editor(c_sel)
+
+    elif menu == "Performance":
+        perf_page()
+
+def schema_editor(category):
+    """Admin overrides for the category's inferred column roles."""
+    with st.expander("🧩 Column roles"):
+        header, stored, roles = dm.category_schema(category)
+        if not header: st.info("No data in this category yet."); return
+        st.caption("Inferred from each upload. Roles set here override that and survive re-uploads.")
+        k = f"sr_{category}"
+        picks = {"name": st.selectbox("Name column", header, index=header.index(roles['name']) if roles['name'] in header else 0,
+                                      key=f"{k}_name")}
+        for r, label in schema.LIST_ROLES.items():
+            picks[r] = st.multiselect(label, header, default=roles[r], key=f"{k}_{r}")
+        c1, c2 = st.columns(2)
+        if c1.button("Save roles", key=f"{k}_save"):
+            dm.set_schema_override(category, picks, st.session_state['user']); st.success("Saved")
+        if stored.get("override") and c2.button("Reset to inferred", key=f"{k}_reset"):
+            dm.set_schema_override(category, {}, st.session_state['user']); st.rerun()
+
+def perf_page():
+    st.header("⏱️ Performance")
+    st.caption("Since process start or last reset. Latency percentiles are histogram bucket bounds.")
+    if st.button("Reset"): perf.reset(); st.rerun()
+    runs = perf.runs()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Reruns logged", len(runs))
+    c2.metric("Sheets requests", sheets_client.stats["requests"])
+    c3.metric("Coalesced reads", sheets_client.stats["coalesced"])
+    c4.metric("Retries", sheets_client.stats["retries"])
+    st.subheader("Timings")
+    st.dataframe(pd.DataFrame(perf.timers()), use_container_width=True, hide_index=True)
+    st.subheader("Caches")
+    st.dataframe(pd.DataFrame(perf.caches()), use_container_width=True, hide_index=True)
+    st.subheader("Recent reruns")
+    if runs: st.dataframe(pd.DataFrame(runs[::-1]).fillna(0), use_container_width=True, hide_index=True)
+    extra = {"sheets": dict(sheets_client.stats), "audit_log": dict(dm.get_audit_log().stats),
+             "pdf_cache": {"items": len(get_pdf_cache().items), "bytes": get_pdf_cache().size}}
+    st.download_button("📩 Export JSON", perf.export(**extra), "perf.json", "application/json")
 
 if 'logged_in' not in st.session_state: st.session_state['logged_in'] = False
 if 'user' not in st.session_state: st.session_state['user'] = ""
@@ -455,11 +586,9 @@ if 'input_disc_val' not in st.session_state: st.session_state['input_disc_val']
 if 'input_disc_type' not in st.session_state: st.session_state['input_disc_type'] = '%'
 
 def check_login(u, p):
-    try: users = dm.get_users()
+    try: res = dm.login(u, p)
     except: return False, "DB Error"
-    if users.empty: return False, "No users"
-    user = users[(users['username'] == u) & (users['password'] == hashlib.sha256(str.encode(p)).hexdigest())]
-    return (True, user.iloc[0]['role']) if not user.empty else (False, "Invalid")
+    return (True, res) if res else (False, "Invalid")
 
 def login_page():
     st.title("🔐 Login")
@@ -470,8 +599,12 @@ def login_page():
         if s: 
             st.session_state['logged_in'] = True
             st.session_state['user'] = u
+            st.session_state['token'], st.session_state['role'] = m
             st.rerun()
         else: st.error(m)
 
-if st.session_state['logged_in']: main_app()
-else: login_page()
+if st.session_state['logged_in'] and not dm.session_user(st.session_state.get('token')):
+    st.session_state['logged_in'] = False  # session expired or server restarted
+with perf.rerun(st.session_state.get('nav', '') if st.session_state['logged_in'] else "login"):
+    if st.session_state['logged_in']: main_app()
+    else: login_page()
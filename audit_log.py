@@ -0,0 +1,82 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+CLAIM_TIMEOUT = 300   # seconds before rows claimed by a dead worker are retried
+MAX_BACKOFF = 60
+
+class AuditLogger:
+    """Write-behind audit log.
+
+    log() only appends to a local SQLite queue, so callers never wait on the
+    network. A daemon worker drains the queue in batches through sink(rows)
+    (one API call per batch) and deletes rows only after the sink succeeded,
+    so entries survive restarts and upstream outages. The queue is capped at
+    max_pending rows; past that the oldest entries are dropped and counted.
+    Rows are claimed before sending, so several processes may share one queue.
+    """
+    def __init__(self, path, sink, batch=200, interval=2.0, max_pending=50000):
+        self.path, self.sink = path, sink
+        self.batch, self.interval, self.max_pending = batch, interval, max_pending
+        self.stats = {"queued": 0, "sent": 0, "dropped": 0, "failures": 0, "last_error": ""}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._db() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("CREATE TABLE IF NOT EXISTS queue (id INTEGER PRIMARY KEY, row TEXT, claimed_at REAL)")
+        self._wake = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    @contextmanager
+    def _db(self):
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            with con: yield con
+        finally: con.close()
+
+    def log(self, row):
+        with self._db() as con:
+            rid = con.execute("INSERT INTO queue (row) VALUES (?)", (json.dumps(row),)).lastrowid
+            dropped = con.execute("DELETE FROM queue WHERE id <= ?", (rid - self.max_pending,)).rowcount
+        self.stats["queued"] += 1
+        self.stats["dropped"] += dropped
+
+    def pending(self):
+        with self._db() as con: return con.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+
+    def flush(self):
+        """Sends everything queued now, on the caller's thread."""
+        while self._flush_once(): pass
+
+    def _claim(self):
+        with self._db() as con:
+            con.execute("BEGIN IMMEDIATE")
+            rows = con.execute("SELECT id, row FROM queue WHERE claimed_at IS NULL OR claimed_at < ? ORDER BY id LIMIT ?",
+                               (time.time() - CLAIM_TIMEOUT, self.batch)).fetchall()
+            con.executemany("UPDATE queue SET claimed_at = ? WHERE id = ?", [(time.time(), i) for i, _ in rows])
+        return rows
+
+    def _flush_once(self):
+        """Sends one batch; True if it was full (more may be waiting)."""
+        rows = self._claim()
+        if not rows: return False
+        ids = [(i,) for i, _ in rows]
+        try: self.sink([json.loads(r) for _, r in rows])
+        except Exception as e:
+            with self._db() as con: con.executemany("UPDATE queue SET claimed_at = NULL WHERE id = ?", ids)
+            self.stats["failures"] += 1; self.stats["last_error"] = f"{type(e).__name__}: {e}"
+            raise
+        with self._db() as con: con.executemany("DELETE FROM queue WHERE id = ?", ids)
+        self.stats["sent"] += len(rows)
+        return len(rows) == self.batch
+
+    def _run(self):
+        delay = self.interval
+        while True:
+            self._wake.wait(delay); self._wake.clear()
+            try:
+                self.flush()
+                delay = self.interval
+            except Exception: delay = min(delay * 2, MAX_BACKOFF)
@@ -0,0 +1,181 @@
+import time
+import threading
+from collections import Counter
+from gspread.exceptions import WorksheetNotFound
+from gspread.utils import a1_range_to_grid_range
+
+# In-memory stand-in for the parts of gspread's Client / Spreadsheet /
+# Worksheet that data_manager uses. Every API-shaped call is counted and can
+# be given a fixed latency to approximate the network.
+
+def _split(rng):
+    """Splits "'Tab'!A2:K" into ("Tab", "A2:K"); a bare tab name has no cell part."""
+    if rng.startswith("'"):
+        i, title = 1, []
+        while True:
+            j = rng.index("'", i)
+            title.append(rng[i:j])
+            if rng[j + 1:j + 2] == "'": title.append("'"); i = j + 2; continue
+            rest = rng[j + 1:]
+            return "".join(title), rest[1:] if rest.startswith("!") else ""
+    title, _, cells = rng.partition("!")
+    return title, cells
+
+class FakeWorksheet:
+    def __init__(self, sh, title, rows=1000, cols=26, sid=0):
+        self.sh, self.title, self.id = sh, title, sid
+        self.row_count, self.col_count = rows, cols
+        self.values = []
+
+    def _call(self, name): self.sh._call(name)
+
+    def _grow(self):
+        self.row_count = max(self.row_count, len(self.values))
+        self.col_count = max([self.col_count] + [len(r) for r in self.values[-1:]])
+
+    def _write(self, top, left, rows):
+        for k, row in enumerate(rows):
+            i = top + k
+            while len(self.values) <= i: self.values.append([])
+            r = self.values[i]
+            if len(r) < left + len(row): r.extend([""] * (left + len(row) - len(r)))
+            r[left:left + len(row)] = [str(v) for v in row]
+        self._grow(); self.sh._touch()
+
+    def read(self, cells=""):
+        g = a1_range_to_grid_range(cells) if cells else {}
+        top, bottom = g.get("startRowIndex", 0), g.get("endRowIndex", len(self.values))
+        left, right = g.get("startColumnIndex", 0), g.get("endColumnIndex", None)
+        out = [list(r[left:right]) for r in self.values[top:bottom]]
+        for r in out:
+            while r and r[-1] == "": r.pop()
+        while out and not out[-1]: out.pop()
+        return out
+
+    # --- gspread.Worksheet API ---
+    def get_all_values(self):
+        self._call("get_all_values")
+        w = max((len(r) for r in self.values), default=0)
+        return [list(r) + [""] * (w - len(r)) for r in self.values]
+
+    def get_all_records(self):
+        self._call("get_all_records")
+        if not self.values: return []
+        h = self.values[0]
+        return [dict(zip(h, list(r) + [""] * (len(h) - len(r)))) for r in self.values[1:]]
+
+    def row_values(self, i):
+        self._call("row_values")
+        return list(self.values[i - 1]) if i <= len(self.values) else []
+
+    def append_row(self, row, **kw): self.append_rows([row])
+
+    def append_rows(self, rows, **kw):
+        self._call("append_rows")
+        self.values.extend([str(v) for v in r] for r in rows)
+        self._grow(); self.sh._touch()
+
+    def update(self, values=None, range_name=None, **kw):
+        self._call("update")
+        g = a1_range_to_grid_range(range_name or "A1")
+        self._write(g.get("startRowIndex", 0), g.get("startColumnIndex", 0), values)
+
+    def batch_update(self, data, **kw):
+        self._call("ws.batch_update")
+        for d in data:
+            g = a1_range_to_grid_range(d["range"])
+            self._write(g.get("startRowIndex", 0), g.get("startColumnIndex", 0), d["values"])
+
+    def clear(self):
+        self._call("clear")
+        self.values = []; self.sh._touch()
+
+    def add_rows(self, n): self._call("add_rows"); self.row_count += n
+    def add_cols(self, n): self._call("add_cols"); self.col_count += n
+
+class FakeSpreadsheet:
+    def __init__(self, latency=0.0):
+        self.latency, self.calls = latency, Counter()
+        self.tabs, self.modified, self._next_id = {}, 0, 1
+        self.lock = threading.Lock()
+
+    def _call(self, name):
+        with self.lock: self.calls[name] += 1
+        if self.latency: time.sleep(self.latency)
+
+    def _touch(self): self.modified += 1
+
+    def load(self, tabs):
+        """Seeds {title: values} without counting API calls."""
+        for title, values in tabs.items():
+            ws = self.tabs.get(title) or self._add(title, max(len(values), 1000), max(len(values[0]) if values else 0, 26))
+            ws.values = [[str(v) for v in r] for r in values]; ws._grow()
+
+    def _add(self, title, rows, cols):
+        ws = self.tabs[title] = FakeWorksheet(self, title, rows, cols, self._next_id)
+        self._next_id += 1
+        return ws
+
+    # --- gspread.Spreadsheet API ---
+    def worksheets(self):
+        self._call("worksheets")
+        return list(self.tabs.values())
+
+    def worksheet(self, title):
+        self._call("worksheet")
+        if title not in self.tabs: raise WorksheetNotFound(title)
+        return self.tabs[title]
+
+    def add_worksheet(self, title, rows, cols, **kw):
+        self._call("add_worksheet")
+        self._touch()
+        return self._add(title, rows, cols)
+
+    def fetch_sheet_metadata(self, params=None):
+        self._call("fetch_sheet_metadata")
+        return {"sheets": [{"properties": {"title": t, "sheetId": ws.id,
+                                           "gridProperties": {"rowCount": ws.row_count, "columnCount": ws.col_count}}}
+                           for t, ws in self.tabs.items()]}
+
+    def get_lastUpdateTime(self):
+        self._call("get_lastUpdateTime")
+        return f"2026-01-01T00:00:00.{self.modified:06d}Z"
+
+    def _tab(self, rng):
+        title, cells = _split(rng)
+        if title not in self.tabs: raise WorksheetNotFound(title)
+        return self.tabs[title], cells
+
+    def values_get(self, rng, **kw):
+        self._call("values_get")
+        ws, cells = self._tab(rng)
+        return {"range": rng, "values": ws.read(cells)}
+
+    def values_batch_get(self, ranges, **kw):
+        self._call("values_batch_get")
+        out = []
+        for rng in ranges:
+            ws, cells = self._tab(rng)
+            out.append({"range": rng, "values": ws.read(cells)})
+        return {"valueRanges": out}
+
+    def values_batch_update(self, body):
+        self._call("values_batch_update")
+        for d in body["data"]:
+            ws, cells = self._tab(d["range"])
+            g = a1_range_to_grid_range(cells)
+            ws._write(g.get("startRowIndex", 0), g.get("startColumnIndex", 0), d["values"])
+
+    def batch_update(self, body):
+        self._call("batch_update")
+        by_id = {ws.id: ws for ws in self.tabs.values()}
+        for req in body["requests"]:
+            r = req["deleteDimension"]["range"]
+            ws = by_id[r["sheetId"]]
+            del ws.values[r["startIndex"]:r["endIndex"]]
+            ws.row_count -= r["endIndex"] - r["startIndex"]
+        self._touch()
+
+class FakeClient:
+    def __init__(self, sheet): self.sheet = sheet
+    def open_by_url(self, url): self.sheet._call("open_by_url"); return self.sheet
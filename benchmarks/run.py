@@ -0,0 +1,179 @@
+"""Offline benchmarks for the app's hot paths.
+
+    python benchmarks/run.py                      # 1k, 10k, 100k catalog rows
+    python benchmarks/run.py --full --out new.json
+    python benchmarks/run.py --baseline old.json  # exit 1 on regressions
+
+Runs against an in-memory gspread (benchmarks/fake_gspread.py) and writes the
+results as JSON; a human-readable table goes to stderr.
+"""
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import platform
+import argparse
+import statistics
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK = tempfile.mkdtemp(prefix="pc-bench-")
+sys.path.insert(0, ROOT)
+os.environ.update(PC_STORAGE="sheets", PC_SNAPSHOT_PATH=os.path.join(WORK, "snapshot.db"),
+                  PC_AUDIT_QUEUE=os.path.join(WORK, "audit.db"), PC_INGEST_DIR=os.path.join(WORK, "ingest"))
+
+import pandas as pd
+import streamlit.config
+import streamlit.logger
+streamlit.config.get_option("logger.level")  # parse config now so it can't reset the level below
+streamlit.logger.set_log_level("error")  # bare-mode "missing ScriptRunContext" noise
+import data_manager as dm
+import snapshot
+import storage
+import pricing
+import quote_pdf
+import app
+from benchmarks import synth
+from benchmarks.fake_gspread import FakeClient, FakeSpreadsheet
+
+SIZES = [1_000, 10_000, 100_000]
+FULL_SIZES = SIZES + [500_000]
+QUOTE_HISTORY = [1_000, 10_000, 50_000]
+NOISE_FLOOR_S = 0.005  # ignore regressions smaller than this in absolute terms
+
+class Bench:
+    def __init__(self, sheet, repeat):
+        self.sheet, self.repeat, self.results = sheet, repeat, []
+
+    def run(self, name, size, fn, setup=None, ops=1, repeat=None):
+        times, calls0 = [], sum(self.sheet.calls.values())
+        for _ in range(repeat or self.repeat):
+            if setup: setup()
+            t0 = time.perf_counter(); fn(); times.append(time.perf_counter() - t0)
+        med = statistics.median(times)
+        rec = {"bench": name, "size": size, "repeat": len(times), "ops": ops,
+               "min_s": round(min(times), 6), "median_s": round(med, 6),
+               "per_op_ms": round(med / ops * 1000, 4),
+               "api_calls": round((sum(self.sheet.calls.values()) - calls0) / len(times), 1)}
+        self.results.append(rec)
+        print(f"{name:<34} {size:>8,} {rec['median_s'] * 1000:>10.1f} ms {rec['per_op_ms']:>10.3f} ms/op "
+              f"{rec['api_calls']:>6} calls", file=sys.stderr)
+        return rec
+
+def use_sheet(sheet, tabs):
+    """Points data_manager at a freshly seeded fake spreadsheet and empty caches."""
+    sheet.tabs.clear(); sheet.load(tabs)
+    dm.forget_worksheets()
+    fresh_snapshot()
+    dm._categories.clear(); dm._schemas.clear(); dm.load_category.clear(); dm.get_all_products_df.clear()
+    dm.get_quote_store.clear(); app._label_parts.clear()
+
+def fresh_snapshot():
+    snapshot.PATH = os.path.join(WORK, f"snapshot-{time.perf_counter_ns()}.db")
+
+def catalog_benches(b, n):
+    cats = synth.catalog(n)
+    tabs = {"categories": [storage.CATEGORY_HEADERS] + [[c, "bench", "2026-01-01"] for c in cats]}
+    tabs.update(cats)
+    use_sheet(b.sheet, tabs)
+
+    def clear_st(): dm._categories.clear(); dm.load_category.clear(); dm.get_all_products_df.clear()
+    b.run("get_all_products_df.cold", n, dm.get_all_products_df, setup=lambda: (fresh_snapshot(), clear_st()))
+    b.run("get_all_products_df.snapshot", n, dm.get_all_products_df, setup=clear_st)
+    df = dm.get_all_products_df()
+    b.run("get_all_products_df.cached", n, lambda: [dm.get_all_products_df() for _ in range(100)], ops=100)
+    one = list(cats)[len(cats) // 2]
+    b.run("load_category.cold", n, lambda: dm.load_category(one), setup=lambda: (fresh_snapshot(), clear_st()))
+    b.run("load_category.cached", n, lambda: [dm.load_category(one) for _ in range(100)], ops=100)
+
+    b.run("generate_search_labels", n, lambda: app.generate_search_labels(df.copy()))
+    b.run("label_index.build", n, app.get_label_index, setup=app._label_parts.clear)
+    b.run("label_index.cached", n, lambda: [app.get_label_index() for _ in range(10)], ops=10)
+    # An upload to one category: only its frame and index part are rebuilt
+    b.run("label_index.one_category_changed", n, app.get_label_index,
+          setup=lambda: dm.save_products_dynamic(pd.DataFrame(cats[one][1:], columns=cats[one][0]).sample(frac=1), one, "bench"))
+    idx = app.get_label_index()
+    labels = random.Random(n).choices(idx["options"], k=10_000)
+    b.run("extract_product_data", n, lambda: [app.extract_product_data(l, idx) for l in labels], ops=len(labels))
+    queries = [l.split(" | ")[0][:random.Random(i).randint(3, 12)] for i, l in enumerate(labels[:200])]
+    b.run("search_engine.search", n, lambda: [idx["engine"].search(q, app.SEARCH_K) for q in queries], ops=len(queries))
+
+def pricing_benches(b):
+    for n in (10, 100, 1_000):
+        its = synth.items(n)
+        b.run("normalize_items (pricing.price_items)", n, lambda: pricing.price_items(its))
+    for n in (10, 100, 500):
+        p = synth.quote_payload(n)
+        row = {"quote_id": "Q-BENCH", "created_at": "2026-01-01", "client_name": p["client_name"],
+               "client_email": p["client_email"], "items_json": json.dumps(p["items"]),
+               "seller_info": json.dumps(p["seller_info"]), "expiration_date": p["expiration_date"]}
+        b.run("create_pdf", n, lambda: quote_pdf.create_pdf(row))
+
+def quote_benches(b, n):
+    use_sheet(b.sheet, {dm.QUOTES_SHEET: synth.quotes(n, storage.QUOTE_HEADERS)})
+    b.run("quote_store.cold_load", n, lambda: dm.get_quote_store().frame(),
+          setup=lambda: (fresh_snapshot(), dm.get_quote_store.clear()))
+    dm.get_quote_store().frame()
+    b.run("query_quotes", n, lambda: [dm.query_quotes(client="client 1", page=p) for p in range(10)], ops=10)
+    payload = synth.quote_payload(10)
+    b.run("save_quote.sequential", n, lambda: [dm.save_quote(payload, "bench") for _ in range(10)], ops=10, repeat=1)
+
+    def burst(k=100):
+        ths = [threading.Thread(target=dm.save_quote, args=(payload, "bench")) for _ in range(k)]
+        [t.start() for t in ths]; [t.join() for t in ths]
+    b.run("save_quote.burst100", n, burst, ops=100, repeat=1)
+
+def compare(results, baseline, tolerance):
+    """Regressions: median slower than baseline by more than tolerance (and the noise floor)."""
+    base = {(r["bench"], r["size"]): r for r in baseline["results"]}
+    out = []
+    for r in results:
+        old = base.get((r["bench"], r["size"]))
+        if not old: continue
+        if r["median_s"] > old["median_s"] * (1 + tolerance) and r["median_s"] - old["median_s"] > NOISE_FLOOR_S:
+            out.append({"bench": r["bench"], "size": r["size"], "old_s": old["median_s"], "new_s": r["median_s"],
+                        "ratio": round(r["median_s"] / old["median_s"], 2)})
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", help="comma-separated catalog row counts")
+    ap.add_argument("--full", action="store_true", help="include the 500k-row catalog")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds added to every fake API call")
+    ap.add_argument("--out", help="write JSON here instead of stdout")
+    ap.add_argument("--baseline", help="earlier JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    args = ap.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",")] if args.sizes else (FULL_SIZES if args.full else SIZES)
+
+    sheet = FakeSpreadsheet(args.latency)
+    dm.get_client = lambda: FakeClient(sheet)
+    dm.get_sheet.clear()
+    dm.request_sync = lambda force=False: None  # no background re-syncs skewing timings
+
+    b = Bench(sheet, args.repeat)
+    for n in sizes: catalog_benches(b, n)
+    pricing_benches(b)
+    for n in QUOTE_HISTORY: quote_benches(b, n)
+
+    report = {"meta": {"python": platform.python_version(), "pandas": pd.__version__, "platform": platform.platform(),
+                       "cpus": os.cpu_count(), "latency_s": args.latency, "repeat": args.repeat,
+                       "at": time.strftime("%Y-%m-%dT%H:%M:%S")},
+              "results": b.results}
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f: report["regressions"] = compare(b.results, json.load(f), args.tolerance)
+        for r in report["regressions"]:
+            print(f"REGRESSION {r['bench']} @ {r['size']:,}: {r['old_s']}s -> {r['new_s']}s (x{r['ratio']})", file=sys.stderr)
+        status = 1 if report["regressions"] else 0
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f: f.write(text)
+    else: print(text)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
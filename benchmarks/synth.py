@@ -0,0 +1,52 @@
+import json
+import random
+
+# Deterministic synthetic catalogs and quote histories shaped like the real tabs
+
+BRANDS = ["MSI", "ASUS", "Gigabyte", "ASRock", "Zotac", "Palit"]
+FAMILIES = ["RTX 4060", "RTX 4070", "RTX 4080", "RX 7800", "B650", "Z790", "X670", "H610"]
+SUFFIXES = ["VENTUS 2X", "GAMING X", "TUF", "EAGLE", "PRO", "TOMAHAWK", "AORUS"]
+CATALOG_HEADER = ["Model", "Brand", "Description", "Chipset", "Memory", "Price", "MSRP", "Stock", "EAN"]
+
+def catalog(rows, categories=None, seed=1):
+    """{category: sheet-shaped values} with rows data rows spread over categories."""
+    rnd = random.Random(seed)
+    categories = categories or max(min(rows // 2500, 200), 4)
+    out = {f"Cat {c:03d}": [list(CATALOG_HEADER)] for c in range(categories)}
+    names = list(out)
+    for i in range(rows):
+        fam = rnd.choice(FAMILIES)
+        model = f"{fam.replace(' ', '')}-{rnd.choice(SUFFIXES).replace(' ', '-')}-{rnd.choice([8, 12, 16, 24])}G-{i:06d}"
+        price = round(rnd.uniform(80, 3000), 2)
+        out[names[i % categories]].append([
+            model, rnd.choice(BRANDS),
+            f"{fam} {rnd.choice(SUFFIXES)} with {rnd.choice(['dual', 'triple'])} fan cooler" if rnd.random() < 0.8 else "",
+            fam, f"{rnd.choice([8, 12, 16, 24])}GB", f"${price:,.2f}", f"{price * 1.2:.2f}",
+            str(rnd.randint(0, 500)), str(rnd.randint(10 ** 12, 10 ** 13 - 1)),
+        ])
+    return out
+
+def items(n, seed=1):
+    rnd = random.Random(seed)
+    return [{"name": f"Item {i}", "desc": "Synthetic line item " * rnd.randint(0, 4), "qty": rnd.randint(1, 20),
+             "price": round(rnd.uniform(5, 2500), 2), "discount_val": rnd.choice([0, 0, 5, 10, 12.5]),
+             "discount_type": rnd.choice(["%", "%", "$"])} for i in range(n)]
+
+def quote_payload(n_items=10, seed=1):
+    return {"client_name": f"Client {seed}", "client_email": "buyer@example.com", "client_phone": "",
+            "total_amount": 0, "expiration_date": "2026-12-31", "items": items(n_items, seed),
+            "seller_info": {"name": "Bench", "email": "bench@example.com", "phone": ""}}
+
+def quotes(n, header, seed=1):
+    """Sheet-shaped quote history (header + n rows)."""
+    rnd = random.Random(seed)
+    rows = [list(header)]
+    for i in range(n):
+        p = quote_payload(rnd.randint(1, 30), seed + i)
+        rec = {"quote_id": f"Q-BENCH-{i:07d}", "created_at": f"2026-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} 10:00:00",
+               "created_by": rnd.choice(["amy", "bob", "cho"]), "client_name": p["client_name"],
+               "client_email": p["client_email"], "client_phone": "", "status": rnd.choice(["Draft", "Sent", "Accepted"]),
+               "total_amount": "0", "items_json": json.dumps(p["items"]), "expiration_date": p["expiration_date"],
+               "seller_info": json.dumps(p["seller_info"])}
+        rows.append([rec.get(c, "") for c in header])
+    return rows
@@ -1,10 +1,40 @@
 import streamlit as st
 import gspread
+from gspread.utils import fill_gaps, rowcol_to_a1
 from oauth2client.service_account import ServiceAccountCredentials
 import pandas as pd
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+import threading
+import hashlib
 import time
 import json 
+import snapshot
+import storage
+import audit_log
+import ingest
+import quote_store
+import user_directory
+import sheets_client
+import perf
+import schema
+
+BATCH_TABS = 20     # tabs per values:batchGet request
+FETCH_WORKERS = 4   # bounded pool for batches and per-tab fallbacks
+SYNC_EVERY = 60     # seconds between background snapshot freshness checks (one replica runs each)
+FULL_SYNC_EVERY = 600  # seconds between syncs that re-read every category tab, not just resized ones
+FETCH_LEASE = 30    # seconds a replica may hold a tab fetch before the others stop waiting for it
+STAMP_POLL = 1.0    # seconds between checks for invalidations broadcast by other replicas
+QUOTE_TAIL_EVERY = 5  # seconds between quote tail reads; the only way quotes saved on other hosts arrive
+CATEGORY_TTL = int(os.environ.get("PC_CATEGORY_TTL", 300))  # per-category frames; the sync also invalidates changed tabs
+QUOTES_SHEET = "quotes_v2"
+CATEGORICAL_MAX = 0.5  # text columns with at most this share of distinct values become categoricals
+# "sheets" (default), "sqlite", or "sqlite+sheets" (SQLite serving, Sheets as a mirror)
+STORAGE = os.environ.get("PC_STORAGE", "sheets")
+SQLITE_PATH = os.environ.get("PC_SQLITE_PATH", os.path.join(".cache", "store.db"))
+AUDIT_QUEUE_PATH = os.environ.get("PC_AUDIT_QUEUE", os.path.join(".cache", "audit_queue.db"))
 
 # --- CONNECT ---
 @st.cache_resource
@@ -12,153 +42,732 @@ def get_client():
     scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
     creds_dict = st.secrets["gcp_service_account"]
     creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-    return gspread.authorize(creds)
+    return gspread.authorize(creds, http_client=sheets_client.QuotaHTTPClient)
 
+@st.cache_resource
 def get_sheet():
     client = get_client()
     # REPLACE WITH YOUR SHEET URL
     url = "https://docs.google.com/spreadsheets/d/1KG8qWTYLa6GEWByYIg2vz3bHrGdW3gvqD_detwhyj7k/edit"
     return client.open_by_url(url)
 
+# Worksheet handles by title, listed with one metadata call and reused until a
+# lookup misses (tab added elsewhere), the sync sees the spreadsheet change, or
+# a write changes a tab's row count
+_ws, _ws_lock = {}, threading.Lock()
+_ws_listed = [0.0]
+WS_MISS_RELIST = 5  # min seconds between relists for lookups of absent tabs
+
+def get_worksheet(title, rows=None, cols=None, header=None):
+    """Cached Worksheet handle; with rows/cols, a missing tab is created (and given header)."""
+    ws = _ws.get(title)
+    if ws is not None: return ws
+    with _ws_lock:
+        if title not in _ws and (not _ws or rows is not None or time.time() - _ws_listed[0] > WS_MISS_RELIST):
+            _ws.clear(); _ws.update((w.title, w) for w in get_sheet().worksheets())
+            _ws_listed[0] = time.time()
+        if title not in _ws:
+            if rows is None: raise gspread.WorksheetNotFound(title)
+            ws = get_sheet().add_worksheet(title, rows, cols)
+            if header: ws.append_row(header)
+            _ws[title] = ws
+        return _ws[title]
+
+def forget_worksheets(*titles):
+    with _ws_lock:
+        if not titles: _ws.clear()
+        for t in titles: _ws.pop(t, None)
+
+# --- BATCHED READS ---
+def _a1_tab(title):
+    return "'" + title.replace("'", "''") + "'"
+
+def _col(n):
+    """Column letters for a 1-based index (28 -> 'AB')."""
+    return rowcol_to_a1(1, n)[:-1]
+
+def _fetch_tab(sh, title):
+    try: return get_worksheet(title).get_all_values()
+    except: return []
+
+def _fetch_batch(sh, titles):
+    try:
+        res = sh.values_batch_get([_a1_tab(t) for t in titles])
+        return [fill_gaps(r.get('values', [])) for r in res.get('valueRanges', [])]
+    except: return None
+
+@perf.timed()
+def fetch_tabs(titles):
+    """Reads many tabs with a few batched requests -> {title: values}.
+
+    A batch fails as a whole if one tab is missing or broken, so its tabs are
+    retried one by one on the same bounded pool.
+    """
+    titles = list(titles)
+    if not titles: return {}
+    sh = get_sheet()
+    batches = [titles[i:i + BATCH_TABS] for i in range(0, len(titles), BATCH_TABS)]
+    out, leftover = {}, []
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as ex:
+        for batch, vals in zip(batches, ex.map(perf.bind(lambda b: _fetch_batch(sh, b)), batches)):
+            if vals is None or len(vals) != len(batch): leftover.extend(batch)
+            else: out.update(zip(batch, vals))
+        for t, vals in zip(leftover, ex.map(perf.bind(lambda t: _fetch_tab(sh, t)), leftover)):
+            out[t] = vals
+    return {t: out[t] for t in titles}
+
+# --- LOCAL SNAPSHOT ---
+_sync = {"running": False, "last": 0.0}
+_sync_lock = threading.Lock()
+
+@perf.timed()
+def read_tabs(titles):
+    """Tab values served from the local snapshot; tabs it doesn't hold yet are
+    fetched now. Freshness is handled by the background sync."""
+    titles = list(titles)
+    try: out = snapshot.load(titles)
+    except: out = {}
+    missing = [t for t in titles if t not in out]
+    if missing: out.update(_fetch_shared(missing))
+    request_sync()
+    return {t: out[t] for t in titles}
+
+def _fetch_shared(titles):
+    """Fetches the tabs no other replica is fetching and waits for the rest to
+    land in the snapshot, so replicas missing the same tab cost one read. A tab
+    still absent when its lease is free again (empty tab, failed fetch) or
+    after FETCH_LEASE is fetched here."""
+    out, waiting, deadline = {}, list(titles), time.time() + FETCH_LEASE
+    while waiting:
+        try: mine = [t for t in waiting if time.time() > deadline or snapshot.lease("fetch:" + t, FETCH_LEASE)]
+        except: mine = waiting
+        if mine:
+            try:
+                try: fresh = snapshot.load(mine)  # the previous holder may have just saved it
+                except: fresh = {}
+                fresh.update(fetch_tabs([t for t in mine if t not in fresh]))
+                try: snapshot.save({t: v for t, v in fresh.items() if v})
+                except: pass
+            finally:
+                try: snapshot.release(["fetch:" + t for t in mine])
+                except: pass
+            out.update(fresh)
+        waiting = [t for t in waiting if t not in out]
+        if waiting:
+            time.sleep(0.1)
+            try: out.update(snapshot.load(waiting))
+            except: pass
+            waiting = [t for t in waiting if t not in out]
+    return out
+
+def invalidate_tabs(*titles):
+    try: snapshot.forget(titles)
+    except: pass
+
+def request_sync(force=False):
+    with _sync_lock:
+        if _sync["running"] or (not force and time.time() - _sync["last"] < SYNC_EVERY): return
+        _sync["running"] = True
+    threading.Thread(target=_sync_snapshot, args=(force,), daemon=True).start()
+
+# Stamp key per synced tab; any tab not listed is a category. A changed categories
+# tab may move roles anywhere, so it drops every frame.
+_TAB_KEYS = {"categories": "catalog", "users": "users"}
+
+def _grid_sizes():
+    """{title: [rows, cols]} for every tab, from one metadata request."""
+    meta = get_sheet().fetch_sheet_metadata({"fields": "sheets.properties(title,gridProperties(rowCount,columnCount))"})
+    out = {}
+    for s in meta.get('sheets', []):
+        g = s['properties'].get('gridProperties', {})
+        out[s['properties']['title']] = [g.get('rowCount', 0), g.get('columnCount', 0)]
+    return out
+
+@perf.timed()
+def _sync_snapshot(force=False):
+    """Refreshes the snapshot if the spreadsheet changed since the last sync.
+
+    Sheets has no per-tab change marker, so the Drive modifiedTime gates the
+    whole sync. When it moved (our own log and quote writes move it too), the
+    small categories and users tabs are re-read along with the category tabs
+    whose grid size changed; every FULL_SYNC_EVERY all category tabs are, to
+    catch in-place edits. Only tabs whose content hash changed are rewritten
+    and invalidate caches, here and (via broadcast) in the other replicas.
+    Quotes are left to the QuoteStore's tail syncs. Replicas sharing the
+    snapshot take turns: whoever holds the sync lease checks, the rest skip.
+    force (the Refresh button) skips the lease and modifiedTime gates and
+    re-reads every category tab.
+    """
+    try:
+        if not force and not snapshot.lease("sync", SYNC_EVERY): return
+        try: stamp = str(get_sheet().get_lastUpdateTime())
+        except: stamp = None
+        if not force and stamp and stamp == snapshot.get_meta("remote_modified"): return
+        forget_worksheets()  # tabs may have been added, renamed or resized
+        now = time.time()
+        full = force or now - float(snapshot.get_meta("full_synced") or 0) > FULL_SYNC_EVERY
+        try: sizes = _grid_sizes()
+        except: sizes, full = {}, True
+        old = json.loads(snapshot.get_meta("grid_sizes") or "{}")
+        cats = fetch_tabs(["categories"])["categories"]
+        names = [c for c in _category_names(cats) if full or sizes.get(c) != old.get(c)]
+        tabs = fetch_tabs(["users"] + names)
+        tabs["categories"] = cats
+        changed = snapshot.save({t: v for t, v in tabs.items() if v})
+        if stamp: snapshot.set_meta("remote_modified", stamp)
+        if sizes: snapshot.set_meta("grid_sizes", json.dumps(sizes))
+        if full: snapshot.set_meta("full_synced", str(now))
+        keys = [_TAB_KEYS.get(t, "tab:" + t) for t in changed]
+        for k in keys: _apply(k)
+        broadcast(*keys)
+    except: pass
+    finally:
+        with _sync_lock: _sync.update(running=False, last=time.time())
+
+# --- SHEETS BACKEND ---
+class SheetsBackend(storage.StorageBackend):
+    """The Google spreadsheet; tab reads go through the local snapshot."""
+    def users(self):
+        data = read_tabs(["users"])["users"]
+        return [dict(zip(data[0], r)) for r in data[1:]] if data else []
+
+    def add_user(self, row):
+        get_worksheet("users", 100, 5, storage.USER_HEADERS).append_row(row)
+        _write_through("users", [row])
+
+    def categories(self):
+        return _category_names(read_tabs(["categories"])["categories"])
+
+    def add_category(self, name, user, created_at):
+        ws = get_worksheet("categories", 100, 4, storage.CATEGORY_HEADERS)
+        
+        existing = [r['category_name'] for r in ws.get_all_records()]
+        if name not in existing:
+            ws.append_row([name, user, created_at])
+            _write_through("categories", [[name, user, created_at]])
+        
+        get_worksheet(name, 1000, 26)
+
+    def category_schemas(self):
+        data = read_tabs(["categories"])["categories"]
+        if len(data) < 2 or "schema" not in data[0]: return {}
+        i = data[0].index("schema")
+        return {r[0]: schema.loads(r[i]) for r in data[1:] if r and len(r) > i and r[i]}
+
+    def set_category_schema(self, name, stored):
+        """Writes the category's schema cell, adding the column to tabs made before the registry."""
+        data = fetch_tabs(["categories"])["categories"]
+        row = next((i for i, r in enumerate(data) if i and r and r[0] == name), None)
+        if row is None: return
+        col = data[0].index("schema") + 1 if "schema" in data[0] else max(len(data[0]), 3) + 1
+        ws = get_worksheet("categories")
+        if col > ws.col_count: ws.add_cols(col - ws.col_count)
+        ws.batch_update([{"range": rowcol_to_a1(1, col), "values": [["schema"]]},
+                         {"range": rowcol_to_a1(row + 1, col), "values": [[schema.dumps(stored)]]}])
+        invalidate_tabs("categories")
+
+    def products(self, categories, fresh=False):
+        return fetch_tabs(categories) if fresh else read_tabs(categories)
+
+    def prefetch(self, categories):
+        """Tabs the snapshot lacks are read together, so per-category loads don't fetch one by one."""
+        try: missing = set(categories) - snapshot.titles(categories)
+        except: return
+        if missing: read_tabs([c for c in categories if c in missing])
+
+    def replace_products(self, category, values):
+        self.clear_products(category, values[0])
+        start = 0
+        for batch in ingest.size_batches(values[1:]):
+            self.write_product_rows(category, start, batch)
+            start += len(batch)
+
+    def clear_products(self, category, header):
+        ws = get_worksheet(category)
+        ws.clear()
+        if len(header) > ws.col_count: ws.add_cols(len(header) - ws.col_count)
+        ws.update([header])
+        invalidate_tabs(category)
+
+    def write_product_rows(self, category, start, rows):
+        """Writes data rows at a fixed position, so a retried batch lands in the same place."""
+        ws = get_worksheet(category)
+        last = start + 1 + len(rows)
+        if last > ws.row_count: ws.add_rows(last - ws.row_count)
+        ws.update(values=rows, range_name=f"A{start + 2}")
+        invalidate_tabs(category)
+
+    def upsert_products(self, category, diff):
+        """Changed rows in size-bounded values batches, EOL rows in one
+        deleteDimension batch (bottom-up so indexes stay valid), then appends."""
+        sh, ws = get_sheet(), get_worksheet(category)
+        width = len(diff["header"])
+        ranges = [{"range": f"{rowcol_to_a1(i + 2, 1)}:{rowcol_to_a1(i + 1 + n, width)}",
+                   "values": [diff["updates"][j] for j in range(i, i + n)]}
+                  for i, n in storage.runs(diff["updates"])]
+        batch, cells = [], 0
+        for r in ranges:
+            if batch and cells + len(r["values"]) * width > ingest.MAX_CELLS:
+                ws.batch_update(batch); batch, cells = [], 0
+            batch.append(r); cells += len(r["values"]) * width
+        if batch: ws.batch_update(batch)
+        if diff["deletes"]:
+            sh.batch_update({"requests": [
+                {"deleteDimension": {"range": {"sheetId": ws.id, "dimension": "ROWS",
+                                               "startIndex": i + 1, "endIndex": i + 1 + n}}}
+                for i, n in reversed(storage.runs(diff["deletes"]))]})
+            forget_worksheets(category)  # cached row_count is stale now
+        for rows in ingest.size_batches(diff["appends"]): ws.append_rows(rows)
+        # Write-through: the merged tab is known, so other tabs and this one stay warm
+        try: snapshot.save({category: diff["values"]})
+        except: invalidate_tabs(category)
+
+    def quotes(self, fresh=False):
+        if fresh: return fetch_tabs([QUOTES_SHEET])[QUOTES_SHEET]
+        return read_tabs([QUOTES_SHEET])[QUOTES_SHEET]
+
+    def quotes_tail(self, n, width):
+        """One open-ended range read: sheet row n+1 (data row n-1) to the end."""
+        end = _col(width)
+        res = get_sheet().values_get(f"{_a1_tab(QUOTES_SHEET)}!A{max(n, 1) + 1}:{end}")
+        return fill_gaps(res.get('values', []), cols=width)
+
+    def _quotes_ws(self):
+        """The quotes worksheet, with its header checked once per process."""
+        ws = get_worksheet(QUOTES_SHEET, 1000, 15, storage.QUOTE_HEADERS)
+        if not getattr(self, "_quotes_checked", False):
+            # Ensure headers are correct
+            if ws.row_values(1) != storage.QUOTE_HEADERS:
+                 ws.update(values=[storage.QUOTE_HEADERS], range_name='A1')
+            self._quotes_checked = True
+        return ws
+
+    def append_quotes(self, rows):
+        try: self._quotes_ws().append_rows(rows)
+        except:
+            # tab may have been renamed or removed
+            forget_worksheets(QUOTES_SHEET); self._quotes_checked = False; raise
+        invalidate_tabs(QUOTES_SHEET)  # too big to rewrite per append; replicas tail-read the new rows
+
+    def _locate(self, qids, positions=None):
+        """{quote_id: data row index}, matched on column A only.
+
+        Position hints are checked with one batched read of their A cells; if
+        any is stale, the quote_id column is read once and searched instead.
+        """
+        sh, tab = get_sheet(), _a1_tab(QUOTES_SHEET)
+        if positions and all(q in positions for q in qids):
+            res = sh.values_batch_get([f"{tab}!A{positions[q] + 2}" for q in qids]).get('valueRanges', [])
+            if [(r.get('values') or [[""]])[0][0] for r in res] == list(qids):
+                return {q: positions[q] for q in qids}
+        wanted, found = set(qids), {}
+        for i, r in enumerate(sh.values_get(f"{tab}!A2:A").get('values', [])):
+            if r and r[0] in wanted and r[0] not in found: found[r[0]] = i
+        return found
+
+    def update_quotes(self, rows, positions=None):
+        pos = self._locate([r[0] for r in rows], positions)
+        end, tab = _col(len(storage.QUOTE_HEADERS)), _a1_tab(QUOTES_SHEET)
+        data = [{"range": f"{tab}!A{pos[r[0]] + 2}:{end}{pos[r[0]] + 2}", "values": [list(r)]}
+                for r in rows if r[0] in pos]
+        if data:
+            get_sheet().values_batch_update({"valueInputOption": "RAW", "data": data})
+            invalidate_tabs(QUOTES_SHEET)
+        return len(data)
+
+    def delete_quotes(self, qids, positions=None):
+        pos = self._locate([str(q) for q in qids], positions)
+        if not pos: return 0
+        sh = get_sheet()
+        sid = get_worksheet(QUOTES_SHEET).id
+        sh.batch_update({"requests": [
+            {"deleteDimension": {"range": {"sheetId": sid, "dimension": "ROWS",
+                                           "startIndex": i + 1, "endIndex": i + 1 + n}}}
+            for i, n in reversed(storage.runs(pos.values()))]})
+        forget_worksheets(QUOTES_SHEET)
+        invalidate_tabs(QUOTES_SHEET)
+        return len(pos)
+
+    def append_logs(self, rows):
+        get_worksheet("logs", 1000, 4, storage.LOG_HEADERS).append_rows(rows)
+
+def _write_through(title, rows):
+    """Appends rows to the snapshot's copy of a small tab we just appended to, so no replica has to refetch it."""
+    try: snapshot.append(title, rows)
+    except: invalidate_tabs(title)
+
+@st.cache_resource
+def get_backend():
+    if STORAGE == "sheets": return SheetsBackend()
+    local = storage.SQLiteBackend(SQLITE_PATH)
+    return storage.MirroredBackend(local, SheetsBackend()) if STORAGE == "sqlite+sheets" else local
+
+@st.cache_resource
+def get_quote_store():
+    return quote_store.QuoteStore(get_backend(), ttl=QUOTE_TAIL_EVERY)
+
+@st.cache_resource
+def get_audit_log():
+    return audit_log.AuditLogger(AUDIT_QUEUE_PATH, lambda rows: get_backend().append_logs(rows))
+
+@st.cache_resource
+def get_user_directory():
+    return user_directory.UserDirectory(get_backend())
+
+# --- SHARED INVALIDATION ---
+# Each replica keeps its own caches; writers bump a version stamp per changed
+# thing in the shared snapshot and every replica's reads apply the stamps that
+# moved since they last looked (at most every STAMP_POLL seconds). Keys:
+# "users", "quotes" (rows appended), "quotes:rows" (rows edited or deleted),
+# "categories" (names and schemas), "catalog" (all of it) and "tab:<category>".
+_seen = {"at": 0.0, "stamps": None}
+_seen_lock = threading.Lock()
+
+def _apply(key):
+    if key == "users": get_user_directory().reload()
+    elif key == "quotes": get_quote_store().refresh()
+    elif key == "quotes:rows": get_quote_store().reload()
+    elif key == "categories": _categories.clear(); _schemas.clear()
+    elif key == "catalog": _categories.clear(); _schemas.clear(); _versions.clear(); load_category.clear(); get_all_products_df.clear()
+    elif key.startswith("tab:"): forget_category(key[4:])
+
+def apply_stamps(force=False):
+    """Drops what other replicas changed since the last check."""
+    with _seen_lock:
+        if not force and time.time() - _seen["at"] < STAMP_POLL: return
+        _seen["at"] = time.time()
+        try: now = snapshot.stamps()
+        except: return
+        old, _seen["stamps"] = _seen["stamps"], now
+    if old is None: return  # first look: nothing cached here predates it
+    changed = [k for k, v in now.items() if old.get(k) != v]
+    if changed: perf.count("shared_cache.invalidations", len(changed))
+    for k in changed:
+        try: _apply(k)
+        except: pass
+
+def broadcast(*keys):
+    """Tells the other replicas keys changed; the caller has already updated its own caches."""
+    apply_stamps(force=True)
+    try: new = snapshot.bump(keys)
+    except: return
+    with _seen_lock:
+        seen = _seen["stamps"]
+        if seen is None: return
+        # our own bump needs no local apply, unless someone else's landed in between
+        for k, v in new.items():
+            if seen.get(k, 0) + 1 == v: seen[k] = v
+
 # --- READ ---
-@st.cache_data(ttl=60)
 def get_users():
-    try:
-        ws = get_sheet().worksheet("users")
-        return pd.DataFrame(ws.get_all_records())
+    apply_stamps()
+    try: return pd.DataFrame(get_user_directory().records())
     except: return pd.DataFrame()
 
+# Cached loaders raise instead of returning empties, so a failed read is never cached
+@perf.timed("data_manager._categories")
 @st.cache_data(ttl=60)
+@perf.miss("data_manager._categories")
+def _categories():
+    return get_backend().categories()
+
 def get_categories():
-    try:
-        ws = get_sheet().worksheet("categories")
-        data = ws.get_all_values()
-        if len(data) < 2: return []
-        return pd.DataFrame(data[1:], columns=data[0])['category_name'].tolist()
+    apply_stamps()
+    try: return _categories()
     except: return []
 
+@perf.timed("data_manager._schemas")
 @st.cache_data(ttl=60)
-def get_all_products_df():
-    sh = get_sheet()
-    cats = get_categories()
-    all_dfs = []
-    for cat in cats:
+@perf.miss("data_manager._schemas")
+def _schemas():
+    return get_backend().category_schemas()
+
+def _category_names(data):
+    if len(data) < 2: return []
+    return pd.DataFrame(data[1:], columns=data[0])['category_name'].tolist()
+
+def compact_catalog(df):
+    """Normalises a loaded catalog once, in place.
+
+    Price columns (per the category schemas in df.attrs, else by name) whose
+    every non-blank cell parses become float (blank = NaN), repetitive text
+    columns (brand, chipset, category...) become categoricals and the
+    remaining text has missing cells as '' with repeats interned.
+    """
+    n = len(df)
+    schemas = df.attrs.get('schemas')
+    prices = {c for r in schemas.values() for c in r['price']} if schemas else {c for c in df.columns if schema.is_price_col(c)}
+    for c in df.columns:
+        s = df[c]
+        if c in prices:
+            txt = s.fillna('').astype(str).str.replace('$', '', regex=False).str.replace(',', '', regex=False).str.strip()
+            num = pd.to_numeric(txt, errors='coerce')
+            if not (num.isna() & ~txt.str.lower().isin(['', 'nan', 'none'])).any():
+                df[c] = num.astype(float); continue
+        s = s.fillna('')
+        if n and s.nunique() <= n * CATEGORICAL_MAX: df[c] = s.astype('category')
+        elif s.dtype == object: df[c] = s.map(lambda v: sys.intern(v) if isinstance(v, str) else v)
+        else: df[c] = s
+    return df
+
+@perf.timed("data_manager.load_category")
+@st.cache_data(ttl=CATEGORY_TTL)
+@perf.miss("data_manager.load_category")
+def load_category(category):
+    """One category's products, compacted; attrs['schemas'] = {category: resolved roles}."""
+    data = get_backend().products([category]).get(category, [])
+    if len(data) < 2: return stamp_version(pd.DataFrame())
+    df = pd.DataFrame(data[1:], columns=data[0])
+    df['category'] = category
+    df.attrs['schemas'] = {category: schema.resolve(_schemas().get(category), data[0], data[1:schema.SAMPLE_ROWS + 1])}
+    return stamp_version(compact_catalog(df))
+
+def get_category_df(category):
+    apply_stamps()
+    try: return load_category(category)
+    except: return pd.DataFrame()
+
+# Version of each category's frame as last handed out, so callers holding
+# derived data (the search index) can tell it is current without reloading
+_versions = {}
+
+def category_version(category):
+    """The category's frame version if known and younger than CATEGORY_TTL, else None."""
+    v = _versions.get(category)
+    return v[0] if v and time.time() - v[1] < CATEGORY_TTL else None
+
+def category_frames(categories):
+    """{category: frame} from the per-category caches; a cold start reads the missing tabs in shared batches."""
+    apply_stamps()
+    try: get_backend().prefetch(categories)
+    except: pass
+    out = {}
+    for c in categories:
         try:
-            ws = sh.worksheet(cat)
-            data = ws.get_all_values()
-            if len(data) > 1:
-                cat_df = pd.DataFrame(data[1:], columns=data[0])
-                cat_df['category'] = cat 
-                all_dfs.append(cat_df)
-        except: continue
-    if not all_dfs: return pd.DataFrame()
-    return pd.concat(all_dfs, ignore_index=True).dropna(axis=1, how='all')
-
-@st.cache_data(ttl=5)
+            out[c] = load_category(c)
+            _versions[c] = (catalog_version(out[c]), time.time())
+        except: out[c] = pd.DataFrame()
+    return out
+
+def forget_category(category):
+    """Drops one category's cached frame (and the assembled catalog built from it)."""
+    _versions.pop(category, None)
+    load_category.clear(category)
+    get_all_products_df.clear()
+
+def refresh_catalog():
+    _versions.clear(); load_category.clear(); get_all_products_df.clear()
+    request_sync(force=True)
+
+@perf.timed("data_manager.get_all_products_df")
+@st.cache_data(ttl=60)
+@perf.miss("data_manager.get_all_products_df")
+def get_all_products_df():
+    """The whole catalog, assembled from the per-category frames; attrs['schemas'] holds each category's roles."""
+    parts = [df for df in category_frames(_categories()).values() if not df.empty]
+    if not parts: return stamp_version(pd.DataFrame())
+    schemas = {c: r for df in parts for c, r in df.attrs['schemas'].items()}
+    df = pd.concat(parts, ignore_index=True).dropna(axis=1, how='all')
+    df.attrs['schemas'] = schemas
+    return stamp_version(compact_catalog(df))
+
+def stamp_version(df):
+    """Tags df with a content hash; indexes derived from it are cached per version."""
+    h = hashlib.md5("\x1f".join(map(str, df.columns)).encode())
+    h.update(json.dumps(df.attrs.get('schemas', {}), sort_keys=True).encode())
+    if not df.empty: h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    df.attrs['version'] = h.hexdigest()
+    return df
+
+def catalog_version(df):
+    return df.attrs.get('version') or stamp_version(df).attrs['version']
+
 def get_quotes():
-    """Fetches quotes from the NEW v2 sheet."""
-    try:
-        ws = get_sheet().worksheet("quotes_v2") # NEW SHEET NAME
-        data = ws.get_all_values()
-        if len(data) < 2: return pd.DataFrame()
-        
-        headers = data[0]
-        rows = data[1:]
-        return pd.DataFrame(rows, columns=headers)
-    except:
-        return pd.DataFrame()
+    """All quotes from the NEW v2 sheet, via the incrementally synced quote store."""
+    apply_stamps()
+    try: return get_quote_store().frame().copy()
+    except: return pd.DataFrame()
+
+def refresh_quotes():
+    get_quote_store().refresh()
+
+@perf.timed()
+def query_quotes(**filters):
+    """(page DataFrame, total matches); see QuoteStore.query."""
+    apply_stamps()
+    try: return get_quote_store().query(**filters)
+    except: return pd.DataFrame(), 0
+
+def quote_filter_options():
+    apply_stamps()
+    store = get_quote_store()
+    return {"creators": store.options("created_by"), "statuses": store.options("status")}
 
 # --- WRITE ---
 def register_user(u, p, e):
-    try: ws = get_sheet().worksheet("users")
-    except: 
-        ws = get_sheet().add_worksheet("users", 100, 5)
-        ws.append_row(["username", "password", "email", "status", "role"])
-    ws.append_row([u, p, e, "pending", "user"])
-    get_users.clear()
+    get_user_directory().add([u, p, e, "pending", "user"])
+    broadcast("users")
+
+# --- SESSIONS ---
+def login(u, p):
+    """(token, role) for valid credentials, else None."""
+    apply_stamps()
+    return get_user_directory().login(u, p)
+
+def session_user(token):
+    """(username, role) while the token is live, else None."""
+    return get_user_directory().session(token) if token else None
+
+def logout(token):
+    get_user_directory().logout(token)
 
 def log_action(user, action, details):
-    try:
-        ws = get_sheet().worksheet("logs")
-        ws.append_row([str(datetime.now()), user, action, details])
+    """Queues the entry locally; get_audit_log's worker ships it in batches."""
+    try: get_audit_log().log([str(datetime.now()), user, action, details])
     except: pass
 
 def add_category(name, user):
-    try: ws = get_sheet().worksheet("categories")
-    except: 
-        ws = get_sheet().add_worksheet("categories", 100, 3)
-        ws.append_row(["category_name", "created_by", "created_at"])
-    
-    existing = [r['category_name'] for r in ws.get_all_records()]
-    if name not in existing:
-        ws.append_row([name, user, str(datetime.now())])
-    
-    try: get_sheet().worksheet(name)
-    except: get_sheet().add_worksheet(name, 1000, 26)
-    get_categories.clear()
+    get_backend().add_category(name, user, str(datetime.now()))
+    _categories.clear()
+    broadcast("categories")
+
+# --- SCHEMAS ---
+def learn_schema(category, header, rows):
+    """Re-infers the category's column roles from an upload, keeping admin overrides."""
+    try:
+        stored = dict(_schemas().get(category, {}))
+        stored["inferred"] = schema.infer(header, rows[:schema.SAMPLE_ROWS])
+        get_backend().set_category_schema(category, stored)
+        _schemas.clear()
+        broadcast("categories")
+    except: pass
+
+def _sample(category):
+    data = get_backend().products([category]).get(category, [])
+    return (data[0], data[1:schema.SAMPLE_ROWS + 1]) if data else ([], [])
+
+def category_schema(category):
+    """(header, stored schema, effective roles) for the admin editor."""
+    header, rows = _sample(category)
+    if not header: return [], {}, {}
+    stored = _schemas().get(category, {})
+    return header, stored, schema.resolve(stored, header, rows)
+
+def set_schema_override(category, roles, user):
+    """Stores the roles that differ from the inferred ones; {} resets to inferred."""
+    header, rows = _sample(category)
+    stored = _schemas().get(category, {})
+    inferred = stored.get("inferred") if stored.get("inferred", {}).get("name") in header else schema.infer(header, rows)
+    stored = {**stored, "inferred": inferred, "override": schema.override(inferred, roles)}
+    get_backend().set_category_schema(category, stored)
+    log_action(user, "Schema", f"{category}: {stored['override']}")
+    _schemas.clear()
+    forget_category(category)
+    broadcast("categories", "tab:" + category)
 
 def save_products_dynamic(df, category, user):
     add_category(category, user)
-    ws = get_sheet().worksheet(category)
-    clean_df = df.astype(str)
-    ws.clear()
-    ws.update([clean_df.columns.tolist()] + clean_df.values.tolist())
+    clean_df = df.fillna('').astype(str)
+    rows = clean_df.values.tolist()
+    ingest.forget_checkpoints(category)
+    get_backend().replace_products(category, [clean_df.columns.tolist()] + rows)
+    learn_schema(category, clean_df.columns.tolist(), rows)
     log_action(user, "Upload", category)
-    get_all_products_df.clear()
+    forget_category(category)
+    broadcast("tab:" + category)
+
+@perf.timed()
+def ingest_products(name, data, category, user, progress=None):
+    """Streams an uploaded file into category in chunks; see ingest.ingest."""
+    add_category(category, user)
+    n = ingest.ingest(name, data, category, get_backend(), progress,
+                      first=lambda header, rows: learn_schema(category, header, rows))
+    log_action(user, "Upload", category)
+    forget_category(category)
+    broadcast("tab:" + category)
+    return n
 
+@perf.timed()
 def update_products_dynamic(new_df, category, user, key_col):
-    save_products_dynamic(new_df, category, user)
-    return {"new": len(new_df), "eol": 0, "total": len(new_df)}
+    """Upserts an upload keyed on key_col, writing only new, changed and EOL rows.
 
-# --- QUOTE SAVE (v2) ---
-def save_quote(quote_data, user):
-    sh = get_sheet()
-    
-    # WE USE A NEW SHEET NAME TO FORCE A FRESH START
-    sheet_name = "quotes_v2"
-    
-    expected_headers = [
-        "quote_id", "created_at", "created_by", 
-        "client_name", "client_email", "client_phone", 
-        "status", "total_amount", "items_json", "expiration_date", "seller_info"
-    ]
-    
-    try:
-        ws = sh.worksheet(sheet_name)
-        # Ensure headers are correct
-        if ws.row_values(1) != expected_headers:
-             ws.update(values=[expected_headers], range_name='A1')
-    except:
-        ws = sh.add_worksheet(title=sheet_name, rows=1000, cols=15)
-        ws.append_row(expected_headers)
-    
-    quote_id = f"Q-{int(time.time())}"
-    seller_info = json.dumps(quote_data.get("seller_info", {}))
+    Falls back to a full rewrite when the tab is new, its columns changed or
+    keys aren't unique.
+    """
+    clean_df = new_df.fillna('').astype(str)
+    values = [clean_df.columns.tolist()] + clean_df.values.tolist()
+    add_category(category, user)
+    backend = get_backend()
+    diff = storage.diff_products(backend.products([category], fresh=True).get(category, []), values, key_col)
+    ingest.forget_checkpoints(category)
+    if diff is None:
+        backend.replace_products(category, values)
+        stats = {"new": len(clean_df), "updated": 0, "eol": 0, "total": len(clean_df)}
+    else:
+        if diff["updates"] or diff["deletes"] or diff["appends"]: backend.upsert_products(category, diff)
+        stats = {"new": len(diff["appends"]), "updated": len(diff["updates"]),
+                 "eol": len(diff["deletes"]), "total": len(clean_df)}
+    learn_schema(category, values[0], values[1:])
+    log_action(user, "Upsert", f"{category}: {stats}")
+    forget_category(category)
+    broadcast("tab:" + category)
+    return stats
 
-    row = [
+# --- QUOTE SAVE (v2) ---
+def _quote_row(quote_id, created_at, user, status, quote_data):
+    return [
         quote_id,
-        str(datetime.now()),
+        created_at,
         user,
         quote_data.get("client_name", ""),
         quote_data.get("client_email", ""),
         quote_data.get("client_phone", ""),
-        "Draft",
+        status,
         str(quote_data.get("total_amount", 0)),
         json.dumps(quote_data.get("items", [])),
         str(quote_data.get("expiration_date", "")),
-        seller_info
+        json.dumps(quote_data.get("seller_info", {}))
     ]
+
+@perf.timed()
+def save_quote(quote_data, user):
+    quote_id = quote_store.new_quote_id()
+    row = _quote_row(quote_id, str(datetime.now()), user, "Draft", quote_data)
     
-    ws.append_row(row)
+    # Joins whatever other sessions are saving right now into one append
+    get_quote_store().append(row)
+    broadcast("quotes")
     log_action(user, "Created Quote", f"ID: {quote_id}")
-    get_quotes.clear() 
     return quote_id
 
+def get_quote(qid):
+    apply_stamps()
+    return get_quote_store().get(qid)
+
+def update_quote(qid, quote_data, user):
+    """Rewrites an existing quote in place, keeping its id, creator, date and status.
+
+    Returns the id it was saved under: a new one if qid is shared by several
+    quotes, None if it no longer exists.
+    """
+    old = get_quote(qid)
+    if not old: return None
+    if qid in get_quote_store().dups: return save_quote(quote_data, user)
+    row = _quote_row(qid, old.get("created_at", ""), old.get("created_by", ""), old.get("status", "Draft"), quote_data)
+    if not get_quote_store().update([row]): return None
+    broadcast("quotes:rows"); log_action(user, "Updated Quote", f"ID: {qid}")
+    return qid
+
+def set_quote_status(qids, status, user):
+    n = get_quote_store().set_status(qids, status)
+    if n: broadcast("quotes:rows"); log_action(user, "Quote Status", f"{status}: {', '.join(qids)}")
+    return n
+
+def delete_quotes(qids, user):
+    n = get_quote_store().delete(qids)
+    if n: broadcast("quotes:rows"); log_action(user, "Deleted Quote", f"IDs: {', '.join(qids)}")
+    return n
+
 def delete_quote(qid, user):
-    try:
-        ws = get_sheet().worksheet("quotes_v2")
-        cell = ws.find(str(qid))
-        ws.delete_rows(cell.row)
-        get_quotes.clear()
-        return True
+    try: return delete_quotes([qid], user) > 0
     except: return False
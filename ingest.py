@@ -0,0 +1,159 @@
+import os
+import io
+import json
+import hashlib
+from datetime import date, datetime
+import pandas as pd
+
+CHUNK_ROWS = 5000      # rows parsed and normalised at a time
+MAX_CELLS = 40000      # per write request
+MAX_BYTES = 2_000_000  # per write request, well under the Sheets payload limit
+CHECKPOINT_DIR = os.environ.get("PC_INGEST_DIR", os.path.join(".cache", "ingest"))
+
+# --- READ ---
+def _cell(v):
+    if v is None: return ""
+    if isinstance(v, float):
+        if v != v: return ""
+        if v.is_integer(): return str(int(v))
+    if isinstance(v, (datetime, date)): return v.isoformat(sep=" ") if isinstance(v, datetime) else v.isoformat()
+    return str(v).strip()
+
+def _header(cells):
+    """Excel header row with pandas-style names for blank and duplicate columns."""
+    out, seen = [], {}
+    for i, c in enumerate(cells):
+        name = _cell(c) or f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1; name = f"{name}.{seen[name]}"
+        else: seen[name] = 0
+        out.append(name)
+    return out
+
+def _normalise(rows, width):
+    """Strings only, padded/trimmed to the header, fully blank rows dropped."""
+    out = []
+    for r in rows:
+        r = [_cell(v) for v in r[:width]]
+        if any(r): out.append(r + [""] * (width - len(r)))
+    return out
+
+def iter_chunks(name, data, chunk_rows=CHUNK_ROWS):
+    """Yields (header, rows) chunks of a CSV or Excel upload without loading it whole."""
+    if name.lower().endswith('csv'):
+        reader = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, chunksize=chunk_rows)
+        for chunk in reader:
+            header = [str(c).strip() for c in chunk.columns]
+            yield header, _normalise(chunk.values.tolist(), len(header))
+        return
+    if name.lower().endswith('xls'):
+        # Legacy .xls has no streaming reader; parse once and slice
+        df = pd.read_excel(io.BytesIO(data), dtype=str)
+        header = [str(c).strip() for c in df.columns]
+        rows = df.values.tolist()
+        for i in range(0, len(rows), chunk_rows): yield header, _normalise(rows[i:i + chunk_rows], len(header))
+        return
+    from openpyxl import load_workbook
+    wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        it = wb.worksheets[0].iter_rows(values_only=True)
+        header = _header(next(it, ()))
+        buf = []
+        for r in it:
+            buf.append(r)
+            if len(buf) >= chunk_rows:
+                yield header, _normalise(buf, len(header)); buf = []
+        if buf: yield header, _normalise(buf, len(header))
+    finally: wb.close()
+
+def estimate_rows(name, data):
+    """Cheap row-count estimate for progress reporting."""
+    if name.lower().endswith('csv'): return max(data.count(b"\n") - 1, 1)
+    try:
+        from openpyxl import load_workbook
+        wb = load_workbook(io.BytesIO(data), read_only=True)
+        n = (wb.worksheets[0].max_row or 2) - 1; wb.close()
+        return max(n, 1)
+    except: return None
+
+def load_values(name, data):
+    """Whole upload as sheet-shaped values, normalised the same way."""
+    header, rows = None, []
+    for header, chunk in iter_chunks(name, data): rows.extend(chunk)
+    return [header] + rows if header else []
+
+# --- WRITE ---
+def size_batches(rows, max_cells=MAX_CELLS, max_bytes=MAX_BYTES):
+    """Splits rows into consecutive slices that fit one write request."""
+    batch, cells, size = [], 0, 0
+    for r in rows:
+        rc, rs = len(r), sum(len(v) for v in r) + 4 * len(r)
+        if batch and (cells + rc > max_cells or size + rs > max_bytes):
+            yield batch; batch, cells, size = [], 0, 0
+        batch.append(r); cells += rc; size += rs
+    if batch: yield batch
+
+def _category_key(category):
+    return hashlib.sha1(category.encode()).hexdigest()[:12]
+
+def _checkpoint(category, job):
+    return os.path.join(CHECKPOINT_DIR, f"{_category_key(category)}-{job}.json")
+
+def _load_checkpoint(category, job, backend):
+    """Committed row count of an earlier run of this job, if the tab still holds
+    exactly what that run wrote (same header, same number of rows); else None."""
+    try:
+        with open(_checkpoint(category, job)) as f: cp = json.load(f)
+        live = backend.products([category], fresh=True).get(category, [])
+        if live and live[0] == cp["header"] and len(live) - 1 == cp["rows"]: return cp["rows"]
+    except: pass
+    return None
+
+def _save_checkpoint(category, job, header, rows):
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = _checkpoint(category, job)
+    with open(path + ".tmp", "w") as f: json.dump({"header": header, "rows": rows}, f)
+    os.replace(path + ".tmp", path)
+
+def forget_checkpoints(category):
+    """Drops every resumable job for category; any other write to it makes them stale."""
+    prefix = _category_key(category) + "-"
+    try: names = os.listdir(CHECKPOINT_DIR)
+    except OSError: return
+    for n in names:
+        if n.startswith(prefix):
+            try: os.remove(os.path.join(CHECKPOINT_DIR, n))
+            except OSError: pass
+
+def ingest(name, data, category, backend, progress=None, first=None):
+    """Streams an upload into category, replacing its contents.
+
+    Rows are written at fixed positions in size-bounded batches and the header
+    and count of committed rows are checkpointed after each one. Re-running
+    the same file into the same category after a failure skips what was
+    already committed instead of clearing the tab again, provided the tab
+    still holds exactly that; otherwise (or after any other write to the
+    category) it starts over. first(header, rows) sees the first chunk.
+    Returns the number of rows written.
+    """
+    job = hashlib.sha1(data + b"\0" + category.encode()).hexdigest()[:20]
+    done = _load_checkpoint(category, job, backend)
+    total = estimate_rows(name, data)
+    pos = 0
+    for header, rows in iter_chunks(name, data):
+        if first: first(header, rows); first = None
+        if done is None:
+            forget_checkpoints(category)
+            backend.clear_products(category, header)
+            done = 0; _save_checkpoint(category, job, header, 0)
+        skip = min(max(done - pos, 0), len(rows))
+        pos += skip
+        for batch in size_batches(rows[skip:]):
+            backend.write_product_rows(category, pos, batch)
+            pos += len(batch)
+            _save_checkpoint(category, job, header, pos)
+            if progress: progress(pos, total)
+    if done is None: raise ValueError("Upload has no data rows")
+    try: os.remove(_checkpoint(category, job))
+    except OSError: pass
+    return pos
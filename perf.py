@@ -0,0 +1,120 @@
+import time
+import json
+import threading
+import functools
+from collections import deque
+
+# Process-wide call statistics. Everything here is cheap enough to leave on.
+BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf")]
+
+_lock = threading.Lock()
+_timers, _misses, _counters = {}, {}, {}
+_runs = deque(maxlen=50)
+_local = threading.local()
+started = time.time()
+
+def record(name, ms):
+    with _lock:
+        t = _timers.get(name)
+        if t is None: t = _timers[name] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "hist": [0] * len(BUCKETS_MS)}
+        t["calls"] += 1; t["total_ms"] += ms; t["max_ms"] = max(t["max_ms"], ms)
+        t["hist"][next(i for i, b in enumerate(BUCKETS_MS) if ms <= b)] += 1
+
+def count(name, n=1):
+    """Bumps a counter, globally and for the rerun this thread is serving."""
+    with _lock: _counters[name] = _counters.get(name, 0) + n
+    run = getattr(_local, "run", None)
+    if run is not None: run[name] = run.get(name, 0) + n
+
+def _wrap(fn, wrapper):
+    wrapper = functools.wraps(fn)(wrapper)
+    if hasattr(fn, "clear"): wrapper.clear = fn.clear  # keep st.cache_* .clear() reachable
+    return wrapper
+
+def timed(name=None):
+    """Records call count and latency of the decorated function."""
+    def deco(fn):
+        key = name or f"{fn.__module__}.{fn.__name__}"
+        def wrapper(*a, **k):
+            t0 = time.perf_counter()
+            try: return fn(*a, **k)
+            finally: record(key, (time.perf_counter() - t0) * 1000)
+        return _wrap(fn, wrapper)
+    return deco
+
+def miss(name):
+    """Goes under @st.cache_*: counts the calls that actually ran the body.
+    Paired with an outer @timed(name), hits = calls - misses."""
+    def deco(fn):
+        def wrapper(*a, **k):
+            with _lock: _misses[name] = _misses.get(name, 0) + 1
+            return fn(*a, **k)
+        return _wrap(fn, wrapper)
+    return deco
+
+def bind(fn):
+    """fn carrying the caller's rerun attribution into a worker thread."""
+    run = getattr(_local, "run", None)
+    def inner(*a, **k):
+        prev, _local.run = getattr(_local, "run", None), run
+        try: return fn(*a, **k)
+        finally: _local.run = prev
+    return inner
+
+class rerun:
+    """Wraps one script rerun; its duration and counters go to the recent-runs log."""
+    def __init__(self, page=""): self.page = page
+
+    def __enter__(self):
+        self.t0, _local.run = time.perf_counter(), {}
+        return self
+
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self.t0) * 1000
+        record("app.rerun", ms)
+        with _lock: _runs.append({"at": time.time(), "page": self.page, "ms": round(ms, 1), **_local.run})
+        _local.run = None
+
+def percentile(hist, q):
+    """Upper bucket bound holding the q-th quantile."""
+    n, acc = sum(hist), 0
+    for c, b in zip(hist, BUCKETS_MS):
+        acc += c
+        if n and acc >= q * n: return b
+    return 0
+
+def timers():
+    with _lock: items = [(k, dict(v)) for k, v in _timers.items()]
+    out = []
+    for name, t in sorted(items, key=lambda kv: -kv[1]["total_ms"]):
+        top = lambda b: b if b != BUCKETS_MS[-1] else round(t["max_ms"], 1)
+        out.append({"name": name, "calls": t["calls"], "mean_ms": round(t["total_ms"] / t["calls"], 2),
+                    "p50_ms": top(percentile(t["hist"], 0.5)), "p95_ms": top(percentile(t["hist"], 0.95)),
+                    "max_ms": round(t["max_ms"], 1), "total_ms": round(t["total_ms"], 1)})
+    return out
+
+def caches():
+    with _lock:
+        out = []
+        for name, m in sorted(_misses.items()):
+            calls = _timers.get(name, {}).get("calls", m)
+            out.append({"name": name, "calls": calls, "hits": calls - m, "misses": m,
+                        "hit_ratio": round((calls - m) / calls, 3) if calls else 0.0})
+        return out
+
+def runs():
+    with _lock: return list(_runs)
+
+def counters():
+    with _lock: return dict(_counters)
+
+def export(**extra):
+    return json.dumps({"since": started, "exported": time.time(), "timers": timers(), "caches": caches(),
+                       "counters": counters(), "runs": runs(), "buckets_ms": BUCKETS_MS[:-1], **extra},
+                      indent=2, default=str)
+
+def reset():
+    global started
+    with _lock:
+        _timers.clear(); _misses.clear(); _counters.clear(); _runs.clear()
+        started = time.time()
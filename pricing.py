@@ -0,0 +1,129 @@
+import json
+import numpy as np
+import pandas as pd
+
+GST_RATE_PCT = 10
+ITEM_DEFAULTS = {"name": "Item", "desc": "", "qty": 1.0, "price": 0.0, "discount_val": 0.0, "discount_type": "%"}
+ITEM_COLS = list(ITEM_DEFAULTS) + ["total"]
+_ITEM_BASE = {**ITEM_DEFAULTS, "total": 0.0}  # field order of a normalised item
+_NUMERIC = [c for c, v in ITEM_DEFAULTS.items() if isinstance(v, float)]
+
+# --- PARSING ---
+def safe_float(val):
+    try:
+        clean = str(val).replace('$', '').replace(',', '').strip()
+        if not clean or clean.lower() in ['none', 'nan']: return 0.0
+        return float(clean)
+    except: return 0.0
+
+def to_number(s):
+    """Column-wise safe_float. Values that already parse skip the string cleaning."""
+    num = pd.to_numeric(s, errors='coerce')
+    bad = num.isna() & s.notna()
+    if bad.any():
+        rest = s[bad].astype(str).str.replace('$', '', regex=False).str.replace(',', '', regex=False).str.strip()
+        num = num.astype(float)
+        num[bad] = pd.to_numeric(rest, errors='coerce')
+    return num.astype(float).fillna(0.0)
+
+# --- MONEY ---
+def to_cents(x):
+    """Rounds dollar amounts to whole cents, half away from zero.
+
+    Rounding x * 100 to 6 places first strips binary noise (1.005 * 100 is
+    100.49999999999999), so this rounds the way the decimal value would.
+    """
+    c = np.round(np.asarray(x, dtype=float) * 100, 6)
+    return (np.sign(c) * np.floor(np.abs(c) + 0.5)).astype(np.int64)
+
+def _gst(sub):
+    return (np.abs(sub) * GST_RATE_PCT + 50) // 100 * np.where(sub >= 0, 1, -1)
+
+def totals(line_cents):
+    """Subtotal, GST and grand total, summed and taxed in integer cents."""
+    sub = int(np.sum(line_cents))
+    gst = int(_gst(sub))
+    return {"subtotal": sub / 100, "gst": gst / 100, "total": (sub + gst) / 100}
+
+# --- ITEMS ---
+def _number(v):
+    """safe_float without the string round trip for values that are already numbers."""
+    if isinstance(v, (int, float)) and not isinstance(v, bool) and v == v: return float(v)
+    return safe_float(v)
+
+def _clean(v, c):
+    """Item field c as priced everywhere: missing (None, NaN, NA) is the default, numbers are parsed."""
+    t = type(v)
+    if t is float or t is int: return ITEM_DEFAULTS[c] if v != v else float(v) if c in _NUMERIC else v
+    if v is None or v is pd.NA or (isinstance(v, float) and v != v): return ITEM_DEFAULTS[c]
+    return _number(v) if c in _NUMERIC else v
+
+def normalize_item(item):
+    """A copy of one item dict with missing fields defaulted and numbers parsed."""
+    n = dict(_ITEM_BASE)
+    if isinstance(item, dict): n.update(item)
+    for c in ITEM_DEFAULTS: n[c] = _clean(n[c], c)
+    return n
+
+def _line_cents(qty, price, dv, pct):
+    gross = qty * price
+    return to_cents(gross - np.where(pct, gross * dv / 100, dv))
+
+def line_cents(items, normalised=False):
+    """Line totals in cents for item dicts, computed on numpy arrays; raw dicts
+    are cleaned field by field, normalised ones read as they are."""
+    n, cols = len(items), ('qty', 'price', 'discount_val')
+    if normalised:
+        qty, price, dv = (np.fromiter((i[c] for i in items), float, n) for c in cols)
+        pct = np.fromiter((i['discount_type'] == '%' for i in items), bool, n)
+    else:
+        qty, price, dv = (np.fromiter((_clean(i.get(c), c) for i in items), float, n) for c in cols)
+        pct = np.fromiter((_clean(i.get('discount_type'), 'discount_type') == '%' for i in items), bool, n)
+    return _line_cents(qty, price, dv, pct)
+
+def price_frame(df):
+    """Cleans an items frame (the Review editor's) the way normalize_item cleans
+    an item and recomputes every line total in one pass."""
+    df = df.copy()
+    for c, v in ITEM_DEFAULTS.items():
+        df[c] = [_clean(x, c) for x in df[c]] if c in df.columns else v
+    cents = _line_cents(*(df[c].to_numpy(float) for c in _NUMERIC), (df['discount_type'] == '%').to_numpy())
+    df['total'] = cents / 100
+    return df[ITEM_COLS + [c for c in df.columns if c not in ITEM_COLS]]
+
+def price_items(items):
+    """(normalised item dicts, totals) for a list of item dicts."""
+    if not isinstance(items, list) or not items: return [], totals([])
+    items = [normalize_item(i) for i in items]
+    cents = line_cents(items, normalised=True)
+    for n, c in zip(items, cents.tolist()): n['total'] = c / 100
+    return items, totals(cents)
+
+def parse_items(items_json):
+    """The item list stored in items_json; entries that aren't dicts become empty (default) items."""
+    try: items = json.loads(items_json)
+    except: return []
+    return [i if isinstance(i, dict) else {} for i in items] if isinstance(items, list) else []
+
+def quote_summary(items_json):
+    """Parsed items, item count and totals for a stored items_json string.
+
+    raw is kept so callers can tell whether a cached summary is still current.
+    """
+    items, t = price_items(parse_items(items_json))
+    return {"raw": items_json, "items": items, "count": len(items), **t}
+
+def quote_summaries(raws):
+    """quote_summary without "items" for many quotes, priced together.
+
+    Every line of every quote goes through line_cents in one pass and is
+    summed per quote in cents.
+    """
+    parsed = [parse_items(r) for r in raws]
+    counts = np.array([len(p) for p in parsed], dtype=np.int64)
+    cents = line_cents([i for p in parsed for i in p])
+    owner = np.repeat(np.arange(len(parsed)), counts)
+    sub = np.bincount(owner, weights=cents, minlength=len(parsed)).round().astype(np.int64)
+    gst = _gst(sub)
+    return [{"raw": r, "count": int(c), "subtotal": s / 100, "gst": g / 100, "total": (s + g) / 100}
+            for r, c, s, g in zip(raws, counts, sub.tolist(), gst.tolist())]
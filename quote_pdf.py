@@ -0,0 +1,191 @@
+import json
+import zipfile
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import wait, FIRST_COMPLETED
+from fpdf import FPDF
+import pricing
+import perf
+
+def sanitize_text(text):
+    if not isinstance(text, str): return str(text)
+    text = text.replace('\u2013', '-').replace('\u2019', "'")
+    return text.encode('latin-1', 'replace').decode('latin-1')
+
+
+# --- PDF (COMBINED BOX LAYOUT) ---
+class QuotePDF(FPDF):
+    def header(self):
+        self.set_font('Arial', 'B', 20); self.cell(80, 10, 'MSI', 0, 0, 'L') 
+        self.set_font('Arial', 'B', 16); self.cell(110, 10, 'Quote', 0, 1, 'R'); self.ln(5)
+    def footer(self):
+        self.set_y(-15); self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, 'Generated by Product Check App - MSI Confidential', 0, 0, 'C')
+
+@perf.timed()
+def create_pdf(quote_row, summary=None):
+    pdf = QuotePDF(); pdf.add_page(); pdf.set_auto_page_break(True, 15)
+    
+    if summary is None: summary = pricing.quote_summary(quote_row.get('items_json', '[]'))
+    items = summary['items']
+    
+    try: seller_info = json.loads(quote_row.get('seller_info', '{}'))
+    except: seller_info = {}
+    
+    s_name = sanitize_text(seller_info.get("name", "MSI Australia"))
+    s_email = sanitize_text(seller_info.get("email", "vincentxu@msi.com"))
+    s_phone = sanitize_text(seller_info.get("phone", ""))
+    
+    c_name = sanitize_text(quote_row.get('client_name', ''))
+    c_email = sanitize_text(quote_row.get('client_email', ''))
+    c_phone = sanitize_text(str(quote_row.get('client_phone', '')))
+    qid = sanitize_text(str(quote_row.get('quote_id', '')))
+    dt = str(quote_row.get('created_at', ''))[:10]
+    exp = str(quote_row.get('expiration_date', ''))
+    if not exp or exp == 'nan': exp = "N/A"
+    
+    sub, gst, grand = summary['subtotal'], summary['gst'], summary['total']
+    
+    pdf.set_font('Arial', '', 10); rx = 130
+    pdf.set_xy(rx, 20); pdf.cell(30, 6, "Quote ref:", 0, 0); pdf.cell(30, 6, qid, 0, 1)
+    pdf.set_x(rx); pdf.cell(30, 6, "Issue date:", 0, 0); pdf.cell(30, 6, dt, 0, 1)
+    pdf.set_x(rx); pdf.cell(30, 6, "Expires:", 0, 0); pdf.cell(30, 6, exp, 0, 1)
+    pdf.set_x(rx); pdf.cell(30, 6, "Currency:", 0, 0); pdf.cell(30, 6, "AUD", 0, 1)
+    pdf.ln(10)
+    
+    ys = pdf.get_y()
+    pdf.set_font('Arial', 'B', 11); pdf.cell(90, 6, "Seller", 0, 1)
+    pdf.set_font('Arial', '', 10)
+    if s_name: pdf.cell(90, 5, s_name, 0, 1)
+    else: pdf.cell(90, 5, "MSI Australia", 0, 1)
+    pdf.cell(90, 5, "Suite 304, Level 3, 63-79 Parramatta Rd", 0, 1)
+    pdf.cell(90, 5, "Silverwater, NSW 2128, Australia", 0, 1)
+    contact_str = f"Email: {s_email}"
+    if s_phone: contact_str += f" | Phone: {s_phone}"
+    pdf.cell(90, 5, contact_str, 0, 1)
+    
+    pdf.set_xy(110, ys)
+    pdf.set_font('Arial', 'B', 11); pdf.cell(80, 6, "Buyer", 0, 1)
+    pdf.set_x(110); pdf.set_font('Arial', '', 10)
+    pdf.cell(80, 5, c_name, 0, 1)
+    if c_email: pdf.set_x(110); pdf.cell(80, 5, f"Email: {c_email}", 0, 1)
+    if c_phone and c_phone != 'nan': pdf.set_x(110); pdf.cell(80, 5, f"Phone: {c_phone}", 0, 1)
+    pdf.ln(15)
+    
+    # Table
+    pdf.set_font('Arial', 'B', 10); pdf.set_fill_color(240, 240, 240)
+    pdf.cell(90, 8, "Item Description", 1, 0, 'L', True) # Merged Header
+    pdf.cell(15, 8, "Qty", 1, 0, 'C', True)
+    pdf.cell(25, 8, "Price", 1, 0, 'R', True)
+    pdf.cell(30, 8, "Disc", 1, 0, 'R', True)
+    pdf.cell(30, 8, "Total", 1, 1, 'R', True)
+    
+    pdf.set_font('Arial', '', 9)
+    if not items:
+        pdf.cell(190, 10, "No items found", 1, 1, 'C')
+    else:
+        for i in items:
+            nm = sanitize_text(i['name'])
+            desc = sanitize_text(i['desc'])
+            
+            # MERGED CELL CONTENT
+            text_content = nm
+            if desc: text_content += f"\n{desc}"
+            
+            # Save Start
+            x_start = pdf.get_x()
+            y_start = pdf.get_y()
+            
+            # 1. Draw MultiCell for Name+Desc
+            pdf.multi_cell(90, 5, text_content, border=1, align='L')
+            
+            # 2. Get Height
+            y_end = pdf.get_y()
+            row_height = y_end - y_start
+            
+            # 3. Draw others to match height
+            pdf.set_xy(x_start + 90, y_start)
+            
+            ds = f"{i['discount_val']}%" if i['discount_type']=='%' else f"${i['discount_val']}"
+            
+            pdf.cell(15, row_height, str(int(i['qty'])), 1, 0, 'C')
+            pdf.cell(25, row_height, f"${i['price']:,.2f}", 1, 0, 'R')
+            pdf.cell(30, row_height, ds, 1, 0, 'R')
+            pdf.cell(30, row_height, f"${i['total']:,.2f}", 1, 1, 'R')
+            
+            # Move cursor to end of this row
+            pdf.set_xy(x_start, y_end)
+
+    pdf.ln(5)
+    pdf.set_x(130); pdf.cell(30, 6, "Subtotal:", 0, 0, 'R'); pdf.cell(30, 6, f"${sub:,.2f}", 0, 1, 'R')
+    pdf.set_x(130); pdf.cell(30, 6, "GST (10%):", 0, 0, 'R'); pdf.cell(30, 6, f"${gst:,.2f}", 0, 1, 'R')
+    pdf.set_font('Arial', 'B', 10)
+    pdf.set_x(130); pdf.cell(30, 8, "Total:", 0, 0, 'R'); pdf.cell(30, 8, f"${grand:,.2f}", 0, 1, 'R')
+    return pdf.output(dest='S').encode('latin-1')
+
+class PDFCache:
+    """Bounded LRU of rendered PDFs keyed by quote content hash."""
+    def __init__(self, max_items=256, max_bytes=64 << 20):
+        self.max_items, self.max_bytes = max_items, max_bytes
+        self.items, self.size = OrderedDict(), 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            data = self.items.get(key)
+            if data is not None: self.items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        with self.lock:
+            if key in self.items: return
+            self.items[key] = data; self.size += len(data)
+            while self.items and (len(self.items) > self.max_items or self.size > self.max_bytes):
+                _, old = self.items.popitem(last=False); self.size -= len(old)
+
+def quote_hash(quote_row):
+    return hashlib.sha256(json.dumps({k: str(v) for k, v in dict(quote_row).items()}, sort_keys=True).encode()).hexdigest()
+
+
+# --- BULK EXPORT ---
+def render(job):
+    """Process-pool entry point: (quote_row, summary or None) -> PDF bytes; None prices the quote here."""
+    return create_pdf(*job)
+
+def export_zip(jobs, out, pool, workers, cache=None, progress=None):
+    """Renders (quote_row, summary) jobs on pool into the ZIP file at out.
+
+    At most 2 * workers renders are in flight, and each PDF is written to the
+    archive as soon as it arrives, so memory stays flat however many quotes
+    are exported. PDFs already in cache skip the pool. Returns the file count.
+    """
+    names, pending, done, total = set(), {}, 0, len(jobs)
+
+    def add(zf, row, data):
+        nonlocal done
+        name = base = str(row.get('quote_id', '') or 'quote')
+        n = 1
+        while name in names: n += 1; name = f"{base}-{n}"
+        names.add(name)
+        zf.writestr(f"{name}.pdf", data); done += 1
+        if progress: progress(done, total)
+
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as zf:  # PDF streams are already compressed
+        it = iter(jobs)
+        while True:
+            while len(pending) < 2 * workers:
+                job = next(it, None)
+                if job is None: break
+                key = quote_hash(job[0]) if cache else None
+                data = cache.get(key) if cache else None
+                if data is not None: add(zf, job[0], data); continue
+                pending[pool.submit(render, job)] = (job[0], key)
+            if not pending: break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for f in finished:
+                row, key = pending.pop(f)
+                data = f.result()
+                if cache: cache.put(key, data)
+                add(zf, row, data)
+    return done
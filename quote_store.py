@@ -0,0 +1,212 @@
+import time
+import secrets
+import threading
+from concurrent.futures import Future
+import pandas as pd
+from storage import QUOTE_HEADERS
+from pricing import quote_summary, quote_summaries
+
+_id_lock = threading.Lock()
+_last_ms = 0
+
+def new_quote_id():
+    """Q-YYYYMMDD-HHMMSSmmm-xxxxxx (UTC).
+
+    Sorts by creation time, strictly increasing within a process, and the
+    random suffix keeps processes apart without any coordination.
+    """
+    global _last_ms
+    with _id_lock:
+        ms = _last_ms = max(int(time.time() * 1000), _last_ms + 1)
+    return f"Q-{time.strftime('%Y%m%d-%H%M%S', time.gmtime(ms // 1000))}{ms % 1000:03d}-{secrets.token_hex(3)}"
+
+class QuoteStore:
+    """Process-wide copy of the quotes table, kept current by tail fetches.
+
+    A cold store starts from the backend's local copy (the snapshot for
+    Sheets). After that, sync() only asks for the rows from the last one
+    already held onward; that row is re-read as an anchor, and if it no longer
+    matches, rows were deleted or reordered elsewhere and the table is reloaded
+    in full. A full reload also runs every full_every seconds so in-place
+    edits made outside the app show up.
+
+    index maps quote_id to its data row position, so lookups are O(1) and
+    writes hand the backend exact rows instead of making it search. dups holds
+    ids shared by several rows (legacy time-based ids); update() skips them
+    rather than rewrite whichever row comes first.
+
+    New quotes go through append(), which group-commits: one writer thread
+    sends everything queued within batch_window as a single append.
+
+    summaries holds each quote's item count and totals by quote_id, computed
+    for all new rows in one vectorized pass and rebuilt only if a row's
+    items_json changes. frame() carries
+    the totals as columns, so listings never parse JSON.
+    """
+    def __init__(self, backend, ttl=5, full_every=600, batch_window=0.05, max_batch=500):
+        self.backend, self.ttl, self.full_every = backend, ttl, full_every
+        self.batch_window, self.max_batch = batch_window, max_batch
+        self._queue, self._qlock, self._wake, self._writer = [], threading.Lock(), threading.Event(), None
+        self.header, self.rows = list(QUOTE_HEADERS), None
+        self.synced = self.full_synced = 0.0
+        self.copy_current = False  # set by reload(): the backend's copy already has the change
+        self.lock = threading.RLock()
+        self.index, self.dups, self.summaries, self._df = {}, set(), {}, None
+
+    def _load(self, values):
+        self.header = [c.strip() for c in values[0]] if values else list(QUOTE_HEADERS)
+        self.rows = [list(r) for r in values[1:]]
+        self._reindex()
+
+    def _reindex(self, start=0):
+        if start == 0: self.index, self.dups = {}, set()
+        todo = []
+        for i in range(start, len(self.rows)):
+            r = self.rows[i]
+            if self.index.setdefault(r[0], i) != i: self.dups.add(r[0])
+            s = self.summaries.get(r[0])
+            if s is None or s['raw'] != self._raw(r): todo.append(r)
+        for r, s in zip(todo, quote_summaries([self._raw(r) for r in todo])): self.summaries[r[0]] = s
+        if start == 0: self.summaries = {q: s for q, s in self.summaries.items() if q in self.index}
+        self._df = None
+
+    def _raw(self, row):
+        k = self.header.index('items_json') if 'items_json' in self.header else len(row)
+        return row[k] if k < len(row) else ''
+
+    def _summary(self, row):
+        raw = self._raw(row)
+        s = self.summaries.get(row[0])
+        if s is None or s['raw'] != raw: s = self.summaries[row[0]] = quote_summary(raw)
+        return s
+
+    def refresh(self):
+        """Makes the next read sync instead of waiting for the TTL."""
+        self.synced = 0.0
+
+    def reload(self):
+        """Makes the next read start over from the backend's local copy, for
+        changes another process announced (tail syncs miss in-place edits)."""
+        with self.lock: self.rows, self.copy_current = None, True
+
+    def sync(self, force=False):
+        with self.lock:
+            now = time.time()
+            if not force and self.rows is not None and now - self.synced < self.ttl: return
+            try:
+                if self.rows is None:
+                    self._load(self.backend.quotes()); self.full_synced = now
+                    if self.copy_current: self.copy_current = False; self.synced = now; return
+                if not self.rows or now - self.full_synced > self.full_every:
+                    self._load(self.backend.quotes(fresh=True)); self.full_synced = now
+                else:
+                    tail = self.backend.quotes_tail(len(self.rows), len(self.header))
+                    if tail and tail[0][0] == self.rows[-1][0]:
+                        if len(tail) > 1:
+                            n = len(self.rows); self.rows.extend(tail[1:]); self._reindex(n)
+                    else:
+                        self._load(self.backend.quotes(fresh=True)); self.full_synced = now
+                self.synced = now
+            except Exception:
+                if self.rows is None: self.rows = []
+
+    def frame(self):
+        """All quotes in sheet order; shared, so callers must not mutate it."""
+        self.sync()
+        with self.lock:
+            if self._df is None:
+                if not self.rows: self._df = pd.DataFrame(); return self._df
+                df = pd.DataFrame(self.rows, columns=self.header)
+                sm = [self._summary(r) for r in self.rows]
+                for col, key in [('item_count', 'count'), ('subtotal', 'subtotal'), ('gst', 'gst'), ('grand_total', 'total')]:
+                    df[col] = [s[key] for s in sm]
+                self._df = df
+            return self._df
+
+    def options(self, col):
+        df = self.frame()
+        return sorted(v for v in df[col].unique() if v) if col in df.columns else []
+
+    def query(self, client="", creator=None, status=None, date_from=None, date_to=None, page=0, page_size=20):
+        """One page of matching quotes, newest first, plus the total match count."""
+        df = self.frame()
+        if df.empty: return df, 0
+        m = pd.Series(True, index=df.index)
+        if client: m &= df['client_name'].str.contains(client, case=False, regex=False, na=False)
+        if creator: m &= df['created_by'] == creator
+        if status: m &= df['status'] == status
+        if date_from or date_to:
+            day = df['created_at'].str[:10]
+            if date_from: m &= day >= str(date_from)
+            if date_to: m &= day <= str(date_to)
+        hits = df[m].sort_values('created_at', ascending=False, kind='stable')
+        return hits.iloc[page * page_size:(page + 1) * page_size].copy(), len(hits)
+
+    def append(self, row):
+        """Queues a new quote row and blocks until it has been written."""
+        with self.lock: self._summary(row)
+        fut = Future()
+        with self._qlock:
+            self._queue.append((row, fut))
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, daemon=True)
+                self._writer.start()
+        self._wake.set()
+        fut.result()
+
+    def _write_loop(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.batch_window)  # let concurrent saves join this batch
+            with self._qlock:
+                batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+                if not self._queue: self._wake.clear()
+            if not batch: continue
+            try: self.backend.append_quotes([r for r, _ in batch])
+            except Exception as e:
+                for _, f in batch: f.set_exception(e)
+                continue
+            self.refresh()
+            for _, f in batch: f.set_result(None)
+
+    def get(self, qid):
+        """The quote as a {column: value} dict, or None."""
+        self.sync()
+        with self.lock:
+            i = self.index.get(qid)
+            return dict(zip(self.header, self.rows[i])) if i is not None else None
+
+    def update(self, rows):
+        """Rewrites existing quotes (full rows, keyed by quote_id) in one batched request.
+
+        Ids that are missing or not unique are skipped; returns the number written.
+        """
+        self.sync()
+        with self.lock:
+            rows = [r for r in rows if r[0] in self.index and r[0] not in self.dups]
+            pos = {r[0]: self.index[r[0]] for r in rows}
+            n = self.backend.update_quotes(rows, pos)
+            for r in rows:
+                if r[0] in pos: self.rows[pos[r[0]]] = list(r); self._summary(r)
+            self._df = None
+        return n
+
+    def set_status(self, qids, status):
+        with self.lock:
+            k = self.header.index('status')
+            rows = []
+            for q in qids:
+                if q in self.index:
+                    r = list(self.rows[self.index[q]]); r[k] = status; rows.append(r)
+            return self.update(rows) if rows else 0
+
+    def delete(self, qids):
+        """Deletes quotes in one batched request."""
+        self.sync()
+        with self.lock:
+            pos = {q: self.index[q] for q in qids if q in self.index}
+            n = self.backend.delete_quotes(list(qids), pos)
+            gone = set(pos.values())
+            self.rows = [r for i, r in enumerate(self.rows) if i not in gone]
+            self._reindex()
+        return n
@@ -0,0 +1,68 @@
+import json
+
+# Column roles per category. Inferred once from an upload's header and rows,
+# stored with the category as {"inferred": roles, "override": roles} and
+# resolved against the loaded tab, so search, autofill and browse read roles
+# instead of scanning column names.
+NAME_KEYS = ['product', 'model']
+PRICE_KEYS = ['price', 'msrp', 'srp', 'cost']
+DESC_KEYS = ['long description', 'description', 'specs', 'detail']
+LABEL_SKIP = ['price', 'cost', 'date', 'category', 'srp', 'msrp', 'margin']
+BLANK = ['nan', 'none', '']
+LIST_ROLES = {
+    "label": "Search label columns",
+    "desc": "Description columns",
+    "price": "Price columns (autofill uses the first positive)",
+    "hidden": "Hidden unless prices are shown",
+}
+SAMPLE_ROWS = 500  # rows looked at when inferring roles from a loaded tab
+
+def _has(c, keys):
+    return any(k in str(c).lower() for k in keys)
+
+def is_price_col(c):
+    return _has(c, PRICE_KEYS)
+
+def infer(header, rows=()):
+    """Roles guessed from column names. The name column is the first product/model
+    column, else the first column holding any value in rows (or the first column)."""
+    cols = [c for c in header if c and c != 'Search_Label']
+    filled = [c for i, c in enumerate(header) if c in cols and
+              any(len(r) > i and str(r[i]).strip().lower() not in BLANK for r in rows)] if rows else cols
+    name = next((c for c in filled if _has(c, NAME_KEYS)), filled[0] if filled else "")
+    price = [c for c in cols if is_price_col(c)]
+    return {"name": name,
+            "label": [c for c in cols if c != name and not _has(c, LABEL_SKIP)],
+            "desc": [c for c in cols if _has(c, DESC_KEYS)],
+            "price": price, "hidden": list(price)}
+
+def resolve(stored, header, rows=()):
+    """Effective roles for a tab: the stored inferred roles (re-inferred if the
+    category predates the registry or its columns changed) with admin overrides
+    on top, restricted to columns the tab still has."""
+    stored = stored or {}
+    cols = set(header)
+    roles = stored.get("inferred")
+    if not roles or roles.get("name") not in cols: roles = infer(header, rows)
+    roles = {**roles, **stored.get("override", {})}
+    out = {r: [c for c in roles.get(r, []) if c in cols] for r in LIST_ROLES}
+    out["name"] = roles["name"] if roles.get("name") in cols else infer(header, rows)["name"]
+    return out
+
+def override(inferred, wanted):
+    """The roles in wanted that differ from inferred; only these are stored as overrides."""
+    return {r: v for r, v in wanted.items() if v != inferred.get(r)}
+
+def groups(schemas):
+    """[(roles, [categories])] with categories sharing identical roles together."""
+    by = {}
+    for cat, roles in schemas.items():
+        by.setdefault(json.dumps(roles, sort_keys=True), (roles, []))[1].append(cat)
+    return list(by.values())
+
+def dumps(stored):
+    return json.dumps(stored, separators=(",", ":")) if stored else ""
+
+def loads(text):
+    try: return json.loads(text) if text else {}
+    except: return {}
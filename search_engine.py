@@ -0,0 +1,110 @@
+import re
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+import perf
+
+# Field weights: a hit on the model / product name outranks a hit in the specs
+NAME_W = 3.0
+SPEC_W = 1.0
+MAX_EXPAND = 50    # vocab tokens a single query term may expand to
+MIN_SIM = 0.45     # trigram (dice) similarity needed for a fuzzy hit
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+
+def tokenize(text):
+    """Lowercase word tokens; model numbers like 'MAG B650M-A' also yield their
+    separator-free forms ('b650ma') so they match however they're typed."""
+    out = []
+    for t in _TOKEN.findall(str(text).lower()):
+        parts = re.split(r"[.\-/]", t)
+        out.extend(parts)
+        if len(parts) > 1: out.append("".join(parts))
+    return [t for t in out if t]
+
+def trigrams(tok):
+    t = f" {tok} "
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+class SearchEngine:
+    """Token / trigram inverted index over catalog labels with top-k ranking.
+
+    Each document is one Search_Label; its name part is indexed with a higher
+    weight than the remaining spec fields. A query term matches vocabulary
+    tokens exactly, by prefix (type-ahead) or by trigram similarity (typos).
+    """
+    def __init__(self, labels, names):
+        self.labels = list(labels)
+        self.vocab = {}
+        self.name_post, self.spec_post = [], []
+        for doc, (lbl, name) in enumerate(zip(self.labels, names)):
+            name_toks = set(tokenize(name))
+            spec_toks = set(tokenize(lbl)) - name_toks
+            for toks, post in ((name_toks, self.name_post), (spec_toks, self.spec_post)):
+                for t in toks: post[self._tid(t)].append(doc)
+        self.tokens = sorted(self.vocab, key=self.vocab.get)
+        self.sorted_vocab = sorted(self.vocab)
+        self.grams = defaultdict(list)
+        for t, tid in self.vocab.items():
+            for g in trigrams(t): self.grams[g].append(tid)
+
+    def _tid(self, tok):
+        tid = self.vocab.get(tok)
+        if tid is None:
+            tid = self.vocab[tok] = len(self.vocab)
+            self.name_post.append(array('i')); self.spec_post.append(array('i'))
+        return tid
+
+    def _expand(self, term):
+        """{token id: similarity} for vocabulary tokens matching one query term."""
+        hits = {}
+        tid = self.vocab.get(term)
+        if tid is not None: hits[tid] = 1.0
+        i = bisect_left(self.sorted_vocab, term)
+        for tok in self.sorted_vocab[i:i + MAX_EXPAND]:
+            if not tok.startswith(term): break
+            hits.setdefault(self.vocab[tok], 0.6 + 0.3 * len(term) / len(tok))
+        if len(term) >= 3:
+            q = trigrams(term); common = defaultdict(int)
+            for g in q:
+                for tid in self.grams.get(g, ()): common[tid] += 1
+            for tid, n in heapq.nlargest(MAX_EXPAND, common.items(), key=lambda kv: kv[1]):
+                if tid in hits: continue
+                sim = 2 * n / (len(q) + len(self.tokens[tid]))
+                if sim >= MIN_SIM: hits[tid] = 0.6 * sim
+        return hits
+
+    @perf.timed("search_engine.search")
+    def search(self, query, k=20):
+        """Top-k labels for query, best first. Documents matching more query
+        terms always rank above those matching fewer."""
+        return [lbl for _, lbl in self.ranked(query, k)]
+
+    def ranked(self, query, k=20):
+        """Top-k (rank key, label) pairs; keys compare across engines."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms: return []
+        scores = defaultdict(float); matched = defaultdict(int)
+        for term in terms:
+            best = {}
+            for tid, sim in self._expand(term).items():
+                for post, w in ((self.name_post[tid], NAME_W), (self.spec_post[tid], SPEC_W)):
+                    sc = sim * w
+                    for doc in post:
+                        if sc > best.get(doc, 0.0): best[doc] = sc
+            for doc, sc in best.items():
+                scores[doc] += sc; matched[doc] += 1
+        rank = lambda d: (matched[d], scores[d], -len(self.labels[d]))
+        return [(rank(d), self.labels[d]) for d in heapq.nlargest(k, scores, key=rank)]
+
+class MultiEngine:
+    """Several engines (one per category) searched as one: each returns its
+    own top-k and the best k of those win, so a part can be rebuilt alone."""
+    def __init__(self, engines):
+        self.engines = list(engines)
+
+    @perf.timed("search_engine.search")
+    def search(self, query, k=20):
+        hits = sorted((h for e in self.engines for h in e.ranked(query, k)), key=lambda h: h[0], reverse=True)
+        return list(dict.fromkeys(lbl for _, lbl in hits))[:k]
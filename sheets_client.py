@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import random
+import threading
+from concurrent.futures import Future
+from requests.exceptions import ConnectionError, Timeout
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+import perf
+
+# Per-minute budgets; the Sheets API default is 60 reads and 60 writes per user per minute
+READS_PER_MIN = int(os.environ.get("PC_SHEETS_READS_PER_MIN", 60))
+WRITES_PER_MIN = int(os.environ.get("PC_SHEETS_WRITES_PER_MIN", 60))
+MAX_RETRIES = 6
+MAX_BACKOFF = 64
+
+stats = {"requests": 0, "coalesced": 0, "retries": 0, "throttled_s": 0.0, "errors": 0}
+
+class TokenBucket:
+    """rate tokens per minute, bursting up to burst."""
+    def __init__(self, per_min, burst=None):
+        self.rate, self.burst = per_min / 60.0, burst or max(per_min // 6, 1)
+        self.tokens, self.stamp = float(self.burst), time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay); waited += delay
+
+def _retryable(err, write):
+    """Quota rejections are always safe to retry. Timeouts and 5xx only for
+    reads: a write may have landed anyway, and appends must not repeat."""
+    if isinstance(err, (ConnectionError, Timeout)): return not write
+    code = err.code
+    if code == 403:  # Drive reports quota as 403 usageLimits
+        errors = err.error.get("errors") or [{}]
+        return errors[0].get("domain") == "usageLimits"
+    return code == 429 or (not write and (code == 408 or code >= 500))
+
+def _retry_after(err):
+    try: return float(err.response.headers.get("Retry-After"))
+    except: return None
+
+class QuotaHTTPClient(HTTPClient):
+    """gspread transport that stays inside the API quota.
+
+    Every request takes a token from the read or write bucket first. Quota
+    errors (429, Drive's 403 usageLimits) and failed reads are retried with
+    jittered exponential backoff, honouring Retry-After. Identical GETs issued
+    while one is already in flight wait for and share that response instead
+    of spending another request.
+    """
+    reads, writes = TokenBucket(READS_PER_MIN), TokenBucket(WRITES_PER_MIN)
+    _inflight, _lock = {}, threading.Lock()
+
+    def request(self, method, endpoint, params=None, data=None, json=None, files=None, headers=None):
+        args = (method, endpoint, params, data, json, files, headers)
+        if method.lower() != "get" or data or json or files: return self._send(*args)
+        key = (endpoint, _key(params), _key(headers))
+        with self._lock:
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader: fut = self._inflight[key] = Future()
+        if not leader:
+            stats["coalesced"] += 1; perf.count("sheets.coalesced")
+            return fut.result()
+        try: fut.set_result(self._send(*args))
+        except BaseException as e: fut.set_exception(e)
+        finally:
+            with self._lock: self._inflight.pop(key, None)
+        return fut.result()
+
+    def _send(self, method, endpoint, params, data, json, files, headers):
+        write = method.lower() != "get"
+        bucket = self.writes if write else self.reads
+        for attempt in range(MAX_RETRIES + 1):
+            stats["throttled_s"] += bucket.take()
+            stats["requests"] += 1; perf.count("sheets.requests")
+            try: return super().request(method, endpoint, params=params, data=data, json=json, files=files, headers=headers)
+            except (APIError, ConnectionError, Timeout) as e:
+                if attempt == MAX_RETRIES or not _retryable(e, write):
+                    stats["errors"] += 1; raise
+                stats["retries"] += 1; perf.count("sheets.retries")
+                wait = _retry_after(e) if isinstance(e, APIError) else None
+                time.sleep(wait if wait is not None else min(2 ** attempt, MAX_BACKOFF) + random.random())
+
+def _key(v):
+    return json.dumps(v, sort_keys=True, default=str) if v else ""
@@ -0,0 +1,144 @@
+import os
+import json
+import zlib
+import time
+import socket
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+# Local copy of the spreadsheet tabs so a cold process can serve reads from disk.
+# Replicas on the same host point at the same file on a local disk, which then
+# also carries version stamps (invalidations broadcast between them) and leases
+# (so only one replica fetches a given tab or runs the sync at a time). Hosts
+# each keep their own file: SQLite's WAL and locking don't work over NFS/SMB,
+# so on a network filesystem the file gets a rollback journal instead of WAL
+# and must not be shared between hosts.
+PATH = os.environ.get("PC_SNAPSHOT_PATH", os.path.join(".cache", "snapshot.db"))
+NETWORK_FS = ("nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "ceph", "glusterfs", "lustre", "fuse.sshfs")
+
+_ready = set()
+
+def network_fs(path):
+    """True if path lives on a network filesystem (per /proc/mounts; False where that isn't available)."""
+    path, best = os.path.realpath(path), ("", "")
+    try:
+        with open("/proc/mounts") as f:
+            for line in f:
+                _, mnt, fs = line.split()[:3]
+                if (path == mnt or path.startswith(mnt.rstrip("/") + "/")) and len(mnt) > len(best[0]): best = (mnt, fs)
+    except: return False
+    return best[1] in NETWORK_FS
+
+def _conn():
+    if PATH not in _ready: os.makedirs(os.path.dirname(os.path.abspath(PATH)), exist_ok=True)
+    con = sqlite3.connect(PATH, timeout=30)
+    if PATH not in _ready:
+        if not network_fs(os.path.dirname(os.path.abspath(PATH))): con.execute("PRAGMA journal_mode=WAL")
+        con.execute("CREATE TABLE IF NOT EXISTS tabs (title TEXT PRIMARY KEY, digest TEXT, data BLOB, synced_at REAL)")
+        con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        con.execute("CREATE TABLE IF NOT EXISTS stamps (key TEXT PRIMARY KEY, version INTEGER)")
+        con.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT, until REAL)")
+        _ready.add(PATH)
+    return con
+
+@contextmanager
+def _db():
+    con = _conn()
+    try:
+        with con: yield con
+    finally: con.close()
+
+def digest(values):
+    return hashlib.sha1(json.dumps(values, separators=(',', ':')).encode()).hexdigest()
+
+def load(titles):
+    """{title: values} for the requested tabs that are in the snapshot."""
+    titles = list(titles)
+    if not titles: return {}
+    with _db() as con:
+        rows = con.execute(f"SELECT title, data FROM tabs WHERE title IN ({','.join('?' * len(titles))})", titles).fetchall()
+    return {t: json.loads(zlib.decompress(d)) for t, d in rows}
+
+def titles(wanted):
+    """The subset of wanted that the snapshot holds."""
+    wanted = list(wanted)
+    if not wanted: return set()
+    with _db() as con:
+        rows = con.execute(f"SELECT title FROM tabs WHERE title IN ({','.join('?' * len(wanted))})", wanted).fetchall()
+    return {r[0] for r in rows}
+
+def save(tabs):
+    """Stores {title: values}; returns the titles whose content actually changed."""
+    if not tabs: return []
+    with _db() as con:
+        old = dict(con.execute("SELECT title, digest FROM tabs").fetchall())
+        changed, now = [], time.time()
+        for t, values in tabs.items():
+            d = digest(values)
+            if old.get(t) == d:
+                con.execute("UPDATE tabs SET synced_at = ? WHERE title = ?", (now, t))
+                continue
+            raw = zlib.compress(json.dumps(values, separators=(',', ':')).encode())
+            con.execute("INSERT OR REPLACE INTO tabs VALUES (?, ?, ?, ?)", (t, d, raw, now))
+            changed.append(t)
+    return changed
+
+def append(title, rows):
+    """Adds rows to a held tab (write-through for appends); False if the tab isn't held."""
+    with _db() as con:
+        con.execute("BEGIN IMMEDIATE")  # read-modify-write, so concurrent appends can't drop rows
+        row = con.execute("SELECT data FROM tabs WHERE title = ?", (title,)).fetchone()
+        if row is None: return False
+        values = json.loads(zlib.decompress(row[0]))
+        w = len(values[0]) if values else 0
+        values += [list(r) + [''] * (w - len(r)) for r in rows]
+        raw = zlib.compress(json.dumps(values, separators=(',', ':')).encode())
+        con.execute("UPDATE tabs SET digest = ?, data = ?, synced_at = ? WHERE title = ?", (digest(values), raw, time.time(), title))
+    return True
+
+def forget(titles):
+    """Drops tabs we just wrote to, so the next read goes to the sheet."""
+    with _db() as con:
+        con.executemany("DELETE FROM tabs WHERE title = ?", [(t,) for t in titles])
+
+def get_meta(key):
+    with _db() as con:
+        row = con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def set_meta(key, value):
+    with _db() as con:
+        con.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+# --- STAMPS ---
+def bump(keys):
+    """Increments each key's version; returns {key: new version}."""
+    out = {}
+    with _db() as con:
+        for k in dict.fromkeys(keys):
+            con.execute("INSERT INTO stamps VALUES (?, 1) ON CONFLICT(key) DO UPDATE SET version = version + 1", (k,))
+            out[k] = con.execute("SELECT version FROM stamps WHERE key = ?", (k,)).fetchone()[0]
+    return out
+
+def stamps():
+    with _db() as con:
+        return dict(con.execute("SELECT key, version FROM stamps").fetchall())
+
+# --- LEASES ---
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+def lease(key, seconds):
+    """True if the calling thread now holds key for seconds; fails while someone else's lease is live."""
+    now = time.time()
+    with _db() as con:
+        cur = con.execute("INSERT INTO leases VALUES (?, ?, ?) ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, "
+                          "until = excluded.until WHERE leases.until < ? OR leases.owner = excluded.owner",
+                          (key, _owner(), now + seconds, now))
+        return cur.rowcount > 0
+
+def release(keys):
+    with _db() as con:
+        con.executemany("DELETE FROM leases WHERE key = ? AND owner = ?", [(k, _owner()) for k in keys])
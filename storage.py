@@ -0,0 +1,260 @@
+import os
+import json
+import sqlite3
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+USER_HEADERS = ["username", "password", "email", "status", "role"]
+CATEGORY_HEADERS = ["category_name", "created_by", "created_at", "schema"]
+QUOTE_HEADERS = [
+    "quote_id", "created_at", "created_by",
+    "client_name", "client_email", "client_phone",
+    "status", "total_amount", "items_json", "expiration_date", "seller_info"
+]
+LOG_HEADERS = ["timestamp", "user", "action", "details"]
+
+def diff_products(old_values, new_values, key_col):
+    """Row-level diff of a product tab keyed on key_col.
+
+    Returns {"updates": {row_idx: row}, "deletes": [row_idx], "appends": [rows],
+    "values": merged tab, ...} with row_idx 0-based over the existing data rows,
+    or None when only a full rewrite is safe (header changed, key column
+    missing, or duplicate keys).
+    """
+    header = new_values[0] if new_values else []
+    if not old_values or old_values[0] != header or key_col not in header: return None
+    k = header.index(key_col)
+    old_rows, new_rows = old_values[1:], new_values[1:]
+    old_pos = {r[k]: i for i, r in enumerate(old_rows)}
+    new_keys = {r[k] for r in new_rows}
+    if len(old_pos) != len(old_rows) or len(new_keys) != len(new_rows): return None
+    updates, appends = {}, []
+    for r in new_rows:
+        i = old_pos.get(r[k])
+        if i is None: appends.append(r)
+        elif old_rows[i] != r: updates[i] = r
+    deletes = [i for key, i in old_pos.items() if key not in new_keys]
+    gone = set(deletes)
+    merged = [header] + [updates.get(i, r) for i, r in enumerate(old_rows) if i not in gone] + appends
+    return {"key_col": key_col, "header": header, "updates": updates, "deletes": deletes,
+            "appends": appends, "values": merged}
+
+def runs(idxs):
+    """Sorted indexes grouped into (start, count) runs of consecutive values."""
+    out = []
+    for i in sorted(idxs):
+        if out and out[-1][0] + out[-1][1] == i: out[-1][1] += 1
+        else: out.append([i, 1])
+    return [tuple(r) for r in out]
+
+class StorageBackend:
+    """What data_manager needs from a store.
+
+    Products and quotes travel as sheet-shaped values (header row + rows of
+    strings) so every backend feeds the same DataFrame code; users come back
+    as records. Category schemas are the JSON-able dicts of schema.py, keyed
+    by category name. fresh=True reads must bypass any local copy. quotes_tail(n)
+    returns the data rows from position n-1 (the caller's last row, as an
+    anchor) onward.
+    """
+    # users
+    def users(self): raise NotImplementedError
+    def add_user(self, row): raise NotImplementedError
+    # categories / products
+    def categories(self): raise NotImplementedError
+    def add_category(self, name, user, created_at): raise NotImplementedError
+    def category_schemas(self): raise NotImplementedError
+    def set_category_schema(self, name, stored): raise NotImplementedError
+    def products(self, categories, fresh=False): raise NotImplementedError
+    def prefetch(self, categories): pass  # warm any local copy ahead of per-category reads
+    def replace_products(self, category, values): raise NotImplementedError
+    def upsert_products(self, category, diff): raise NotImplementedError
+    def clear_products(self, category, header): raise NotImplementedError
+    def write_product_rows(self, category, start, rows): raise NotImplementedError
+    # quotes
+    def quotes(self, fresh=False): raise NotImplementedError
+    def quotes_tail(self, n, width): raise NotImplementedError
+    def append_quotes(self, rows): raise NotImplementedError
+    def update_quotes(self, rows, positions=None): raise NotImplementedError
+    def delete_quotes(self, qids, positions=None): raise NotImplementedError
+    # audit log
+    def append_logs(self, rows): raise NotImplementedError
+
+class SQLiteBackend(StorageBackend):
+    """Local store with real indexes, for offline and high-volume runs."""
+    SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS users (username TEXT PRIMARY KEY, password TEXT, email TEXT, status TEXT, role TEXT);
+    CREATE TABLE IF NOT EXISTS categories (category_name TEXT PRIMARY KEY, created_by TEXT, created_at TEXT, schema TEXT);
+    CREATE TABLE IF NOT EXISTS product_headers (category TEXT PRIMARY KEY, header TEXT);
+    CREATE TABLE IF NOT EXISTS products (category TEXT NOT NULL, row_no INTEGER NOT NULL, data TEXT,
+                                         PRIMARY KEY (category, row_no));
+    CREATE TABLE IF NOT EXISTS quotes ({", ".join(c + (" TEXT PRIMARY KEY" if c == "quote_id" else " TEXT") for c in QUOTE_HEADERS)});
+    CREATE INDEX IF NOT EXISTS quotes_created_by ON quotes (created_by);
+    CREATE TABLE IF NOT EXISTS logs (timestamp TEXT, user TEXT, action TEXT, details TEXT);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._db() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(self.SCHEMA)
+            # stores created before the schema registry
+            if "schema" not in [r[1] for r in con.execute("PRAGMA table_info(categories)")]:
+                con.execute("ALTER TABLE categories ADD COLUMN schema TEXT")
+
+    @contextmanager
+    def _db(self):
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            with con: yield con
+        finally: con.close()
+
+    def users(self):
+        with self._db() as con:
+            rows = con.execute(f"SELECT {', '.join(USER_HEADERS)} FROM users ORDER BY rowid").fetchall()
+        return [dict(zip(USER_HEADERS, r)) for r in rows]
+
+    def add_user(self, row):
+        with self._db() as con: con.execute("INSERT INTO users VALUES (?, ?, ?, ?, ?)", row)
+
+    def categories(self):
+        with self._db() as con:
+            return [r[0] for r in con.execute("SELECT category_name FROM categories ORDER BY rowid")]
+
+    def add_category(self, name, user, created_at):
+        with self._db() as con:
+            con.execute("INSERT OR IGNORE INTO categories (category_name, created_by, created_at) VALUES (?, ?, ?)",
+                        (name, user, created_at))
+
+    def category_schemas(self):
+        with self._db() as con:
+            rows = con.execute("SELECT category_name, schema FROM categories WHERE schema IS NOT NULL").fetchall()
+        return {n: json.loads(s) for n, s in rows if s}
+
+    def set_category_schema(self, name, stored):
+        with self._db() as con:
+            con.execute("UPDATE categories SET schema = ? WHERE category_name = ?", (json.dumps(stored), name))
+
+    def products(self, categories, fresh=False):
+        out = {}
+        with self._db() as con:
+            for cat in categories:
+                h = con.execute("SELECT header FROM product_headers WHERE category = ?", (cat,)).fetchone()
+                rows = con.execute("SELECT data FROM products WHERE category = ? ORDER BY row_no", (cat,))
+                out[cat] = [json.loads(h[0])] + [json.loads(r[0]) for r in rows] if h else []
+        return out
+
+    def replace_products(self, category, values):
+        with self._db() as con:
+            con.execute("DELETE FROM products WHERE category = ?", (category,))
+            con.execute("INSERT OR REPLACE INTO product_headers VALUES (?, ?)", (category, json.dumps(values[0])))
+            con.executemany("INSERT INTO products VALUES (?, ?, ?)",
+                            ((category, i, json.dumps(r)) for i, r in enumerate(values[1:])))
+
+    def upsert_products(self, category, diff):
+        with self._db() as con:
+            nos = [r[0] for r in con.execute("SELECT row_no FROM products WHERE category = ? ORDER BY row_no", (category,))]
+            con.executemany("UPDATE products SET data = ? WHERE category = ? AND row_no = ?",
+                            [(json.dumps(r), category, nos[i]) for i, r in diff["updates"].items()])
+            con.executemany("DELETE FROM products WHERE category = ? AND row_no = ?",
+                            [(category, nos[i]) for i in diff["deletes"]])
+            nxt = nos[-1] + 1 if nos else 0
+            con.executemany("INSERT INTO products VALUES (?, ?, ?)",
+                            ((category, nxt + j, json.dumps(r)) for j, r in enumerate(diff["appends"])))
+
+    def clear_products(self, category, header):
+        with self._db() as con:
+            con.execute("DELETE FROM products WHERE category = ?", (category,))
+            con.execute("INSERT OR REPLACE INTO product_headers VALUES (?, ?)", (category, json.dumps(header)))
+
+    def write_product_rows(self, category, start, rows):
+        with self._db() as con:
+            con.executemany("INSERT OR REPLACE INTO products VALUES (?, ?, ?)",
+                            ((category, start + i, json.dumps(r)) for i, r in enumerate(rows)))
+
+    def quotes(self, fresh=False):
+        with self._db() as con:
+            rows = con.execute(f"SELECT {', '.join(QUOTE_HEADERS)} FROM quotes ORDER BY rowid").fetchall()
+        return [list(QUOTE_HEADERS)] + [list(r) for r in rows] if rows else []
+
+    def quotes_tail(self, n, width):
+        with self._db() as con:
+            rows = con.execute(f"SELECT {', '.join(QUOTE_HEADERS)} FROM quotes ORDER BY rowid LIMIT -1 OFFSET ?",
+                               (max(n - 1, 0),)).fetchall()
+        return [list(r)[:width] + [""] * (width - len(r)) for r in rows]
+
+    def append_quotes(self, rows):
+        with self._db() as con:
+            con.executemany(f"INSERT INTO quotes VALUES ({', '.join('?' * len(QUOTE_HEADERS))})", rows)
+
+    def update_quotes(self, rows, positions=None):
+        cols = ", ".join(f"{c} = ?" for c in QUOTE_HEADERS[1:])
+        with self._db() as con:
+            return sum(con.execute(f"UPDATE quotes SET {cols} WHERE quote_id = ?", list(r[1:]) + [r[0]]).rowcount
+                       for r in rows)
+
+    def delete_quotes(self, qids, positions=None):
+        qids = [str(q) for q in qids]
+        with self._db() as con:
+            return con.execute(f"DELETE FROM quotes WHERE quote_id IN ({','.join('?' * len(qids))})", qids).rowcount
+
+    def append_logs(self, rows):
+        with self._db() as con: con.executemany("INSERT INTO logs VALUES (?, ?, ?, ?)", rows)
+
+class MirroredBackend(StorageBackend):
+    """Serves everything from primary and replays writes to mirror (e.g. Sheets)
+    on a single background worker, so mirror latency and outages never reach users."""
+    def __init__(self, primary, mirror):
+        self.primary, self.mirror = primary, mirror
+        self._pool = ThreadPoolExecutor(max_workers=1)  # one worker keeps writes in order
+
+    def _write(self, name, *args):
+        res = getattr(self.primary, name)(*args)
+        self._pool.submit(self._replay, name, args)
+        return res
+
+    def _replay(self, name, args):
+        try: getattr(self.mirror, name)(*args)
+        except: pass
+
+    def users(self): return self.primary.users()
+    def categories(self): return self.primary.categories()
+    def category_schemas(self): return self.primary.category_schemas()
+    def products(self, categories, fresh=False): return self.primary.products(categories, fresh)
+    def prefetch(self, categories): return self.primary.prefetch(categories)
+    def quotes(self, fresh=False): return self.primary.quotes(fresh)
+    def quotes_tail(self, n, width): return self.primary.quotes_tail(n, width)
+
+    def add_user(self, row): return self._write("add_user", row)
+    def add_category(self, name, user, created_at): return self._write("add_category", name, user, created_at)
+    def set_category_schema(self, name, stored): return self._write("set_category_schema", name, stored)
+    def replace_products(self, category, values): return self._write("replace_products", category, values)
+
+    def upsert_products(self, category, diff):
+        res = self.primary.upsert_products(category, diff)
+        self._pool.submit(self._replay_upsert, category, diff["values"], diff["key_col"])
+        return res
+
+    def _replay_upsert(self, category, values, key_col):
+        """The mirror may have drifted, so it gets a diff against its own copy."""
+        try:
+            diff = diff_products(self.mirror.products([category], fresh=True).get(category, []), values, key_col)
+            if diff: self.mirror.upsert_products(category, diff)
+            else: self.mirror.replace_products(category, values)
+        except: pass
+    def clear_products(self, category, header): return self._write("clear_products", category, header)
+    def write_product_rows(self, category, start, rows): return self._write("write_product_rows", category, start, rows)
+    def append_quotes(self, rows): return self._write("append_quotes", rows)
+
+    # Position hints belong to the primary; the mirror locates rows itself
+    def update_quotes(self, rows, positions=None):
+        res = self.primary.update_quotes(rows, positions)
+        self._pool.submit(self._replay, "update_quotes", (rows,))
+        return res
+
+    def delete_quotes(self, qids, positions=None):
+        res = self.primary.delete_quotes(qids, positions)
+        self._pool.submit(self._replay, "delete_quotes", (qids,))
+        return res
+    def append_logs(self, rows): return self._write("append_logs", rows)
@@ -0,0 +1,51 @@
+import pytest
+import ingest
+import storage
+
+class FlakyBackend(storage.SQLiteBackend):
+    """Fails the write_product_rows call numbered fail_at (1-based)."""
+    fail_at = None
+
+    def write_product_rows(self, category, start, rows):
+        self.writes = getattr(self, "writes", 0) + 1
+        if self.writes == self.fail_at: raise IOError("write failed")
+        super().write_product_rows(category, start, rows)
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "CHECKPOINT_DIR", str(tmp_path / "ingest"))
+    monkeypatch.setattr(ingest, "size_batches", lambda rows: ([r] for r in rows))
+    return FlakyBackend(str(tmp_path / "store.db"))
+
+def csv(header, rows):
+    return "\n".join(",".join(r) for r in [header] + rows).encode()
+
+F = (["sku", "price"], [[f"F{i}", str(i)] for i in range(1, 6)])
+G = (["code", "name", "cost"], [[f"G{i}", "g", str(i)] for i in range(1, 4)])
+
+def test_retry_resumes_where_it_failed(backend):
+    backend.fail_at = 3
+    with pytest.raises(IOError): ingest.ingest("f.csv", csv(*F), "Cat", backend)
+    backend.fail_at, backend.writes = None, 0
+    assert ingest.ingest("f.csv", csv(*F), "Cat", backend) == 5
+    assert backend.writes == 3
+    assert backend.products(["Cat"])["Cat"] == [F[0]] + F[1]
+
+def test_retry_after_other_upload_starts_over(backend):
+    backend.fail_at = 3
+    with pytest.raises(IOError): ingest.ingest("f.csv", csv(*F), "Cat", backend)
+    backend.fail_at = None
+    ingest.ingest("g.csv", csv(*G), "Cat", backend)
+    assert backend.products(["Cat"])["Cat"] == [G[0]] + G[1]
+    ingest.ingest("f.csv", csv(*F), "Cat", backend)
+    assert backend.products(["Cat"])["Cat"] == [F[0]] + F[1]
+
+def test_retry_after_other_write_starts_over(backend):
+    backend.fail_at = 3
+    with pytest.raises(IOError): ingest.ingest("f.csv", csv(*F), "Cat", backend)
+    backend.fail_at = None
+    # a direct replace (same header, same row count as committed) the checkpoint can't see
+    ingest.forget_checkpoints("Cat")
+    backend.replace_products("Cat", [F[0], ["X1", "9"], ["X2", "9"]])
+    ingest.ingest("f.csv", csv(*F), "Cat", backend)
+    assert backend.products(["Cat"])["Cat"] == [F[0]] + F[1]
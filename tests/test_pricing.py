@@ -0,0 +1,34 @@
+import json
+import math
+import pandas as pd
+import pytest
+import pricing
+
+MALFORMED = [
+    {"qty": None, "price": 10},
+    {"qty": float("nan"), "price": "$1,200.50", "discount_val": None},
+    {"price": 19.99, "discount_val": 5, "discount_type": None},
+    {"qty": "3", "price": "abc", "discount_val": "10", "discount_type": "$"},
+    {"qty": 2, "price": 7.5, "discount_val": float("nan"), "discount_type": float("nan")},
+    {"name": None, "desc": None},
+    {},
+]
+
+@pytest.mark.parametrize("item", MALFORMED)
+def test_editor_and_save_price_alike(item):
+    frame = pricing.price_frame(pd.DataFrame([item]))
+    saved, t = pricing.price_items([item])
+    assert frame.iloc[0]["total"] == saved[0]["total"]
+    for c in pricing.ITEM_DEFAULTS:
+        assert frame.iloc[0][c] == saved[0][c]
+    assert pricing.quote_summaries([json.dumps([item], allow_nan=True)])[0]["total"] == t["total"]
+
+def test_missing_quantity_is_one():
+    assert pricing.price_frame(pd.DataFrame([{"qty": None, "price": 10}])).iloc[0]["total"] == 10.0
+    assert pricing.price_items([{"qty": None, "price": 10}])[1]["subtotal"] == 10.0
+
+def test_whole_list_matches():
+    df = pricing.price_frame(pd.DataFrame(MALFORMED))
+    saved, t = pricing.price_items(MALFORMED)
+    assert df["total"].tolist() == [i["total"] for i in saved]
+    assert math.isclose(pricing.totals(pricing.to_cents(df["total"]))["total"], t["total"])
@@ -0,0 +1,82 @@
+import time
+import hmac
+import hashlib
+import secrets
+import threading
+from storage import USER_HEADERS
+
+SESSION_TTL = 1800     # idle seconds before a session token expires
+RELOAD_EVERY = 300     # full reload, picks up edits made directly in the sheet
+MISS_RELOAD = 10       # min seconds between reloads triggered by unknown usernames
+
+def hash_password(p):
+    return hashlib.sha256(str.encode(p)).hexdigest()
+
+class UserDirectory:
+    """Process-wide username -> user record index plus a session token cache.
+
+    The users table is read once and then kept current by add(); a periodic
+    reload (and, rate-limited, a lookup of an unknown name) catches users added
+    by other processes. Sessions are random tokens held in memory with a
+    sliding expiry, so per-request auth and role checks never touch the store.
+    """
+    def __init__(self, backend, session_ttl=SESSION_TTL):
+        self.backend, self.session_ttl = backend, session_ttl
+        self.by_name, self.loaded, self.sessions = None, 0.0, {}
+        self.lock = threading.RLock()
+
+    def _load(self):
+        self.by_name = {str(u.get('username', '')): u for u in self.backend.users()}
+        self.loaded = time.time()
+
+    def _index(self):
+        with self.lock:
+            if self.by_name is None or time.time() - self.loaded > RELOAD_EVERY: self._load()
+            return self.by_name
+
+    def get(self, username):
+        rec = self._index().get(username)
+        if rec is None:
+            with self.lock:
+                if time.time() - self.loaded > MISS_RELOAD:
+                    self._load(); rec = self.by_name.get(username)
+        return rec
+
+    def reload(self):
+        """Makes the next lookup read the users table again (another process changed it)."""
+        with self.lock: self.by_name = None
+
+    def records(self):
+        return list(self._index().values())
+
+    def add(self, row):
+        self.backend.add_user(row)
+        with self.lock:
+            if self.by_name is not None: self.by_name[row[0]] = dict(zip(USER_HEADERS, row))
+
+    # --- SESSIONS ---
+    def login(self, username, password):
+        """(token, role) for valid credentials, else None."""
+        rec = self.get(username)
+        if not rec or not hmac.compare_digest(str(rec.get('password', '')), hash_password(password)): return None
+        token = secrets.token_urlsafe(24)
+        with self.lock:
+            self._prune()
+            self.sessions[token] = [username, rec.get('role', 'user'), time.time() + self.session_ttl]
+        return token, rec.get('role', 'user')
+
+    def session(self, token):
+        """(username, role) for a live token, extending its expiry; else None."""
+        with self.lock:
+            s = self.sessions.get(token)
+            if not s: return None
+            if s[2] < time.time(): del self.sessions[token]; return None
+            s[2] = time.time() + self.session_ttl
+            return s[0], s[1]
+
+    def logout(self, token):
+        with self.lock: self.sessions.pop(token, None)
+
+    def _prune(self):
+        now = time.time()
+        for t in [t for t, s in self.sessions.items() if s[2] < now]: del self.sessions[t]